@@ -1,4 +1,12 @@
-from gui.ProjectStructureGUI import ProjectStructureApp
+import sys
 if __name__ == '__main__':
+    # 打包为可执行程序后，并行扫描的子进程需要由此进入
+    import multiprocessing
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        # ===== 命令行模式: 不加载 GUI (ttkbootstrap) =====
+        from cli.ProjectStructureCLI import main
+        sys.exit(main())
     # ===== 启动应用 =====
+    from gui.ProjectStructureGUI import ProjectStructureApp
     ProjectStructureApp()
\ No newline at end of file
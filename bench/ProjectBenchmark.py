@@ -0,0 +1,302 @@
+"""
+可复现的基准测试: 在确定性的合成项目树 (bench.SyntheticTree) 上分别运行各个阶段，
+输出每秒文件数、MB/s 和峰值内存 (RSS)，结果保存为 JSON，并可与保存的基线比较、标出性能回退。
+
+    python -m bench.ProjectBenchmark run -o bench_results.json [--profiles wide gbk] [--stages json restore_json] [--scale 0.2]
+    python -m bench.ProjectBenchmark run -o current.json --baseline baseline.json
+    python -m bench.ProjectBenchmark compare baseline.json current.json [--threshold 0.1]
+
+每个 (项目类型, 阶段) 的每次运行都在独立的子进程中进行，峰值 RSS 只反映该阶段本身，也不受上一次运行的缓存影响。
+还原类阶段先在同一子进程中生成导出文件（不计时），只对还原本身计时。
+有回退时 compare（以及带 --baseline 的 run）以退出码 1 结束，可直接用于 CI。
+"""
+from bench.SyntheticTree import PROFILES, ensure_tree
+from contextlib import redirect_stdout
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+WORK_DIR = Path(tempfile.gettempdir()) / "pse-bench"
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.10
+RESULTS_VERSION = 1
+
+STAGES = ("scan", "tree", "json", "xml", "archive", "all", "incremental",
+          "restore_json", "restore_xml", "restore_archive", "roundtrip")
+_OUTPUT_FILES = {"json": "project_content.json", "xml": "project_content.xml", "archive": "project_content.psa"}
+
+def peak_rss_bytes():
+    """当前进程的峰值常驻内存（字节），无法获取时返回 None"""
+    try:
+        # Linux: VmHWM 属于当前地址空间，不会继承父进程的峰值
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 上单位是字节，其他系统是 KB
+        return rss if sys.platform == "darwin" else rss * 1024
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        return _windows_peak_rss()
+    return None
+
+def _windows_peak_rss():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.windll.kernel32
+    psapi = ctypes.windll.psapi
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+# ===== 子进程: 运行单个阶段 =====
+
+def _drain(generator):
+    """消费 先yield进度、最后yield结果 的生成器，返回最后的结果"""
+    result = None
+    for result in generator:
+        pass
+    return result
+
+def _extractor(tree, scan_workers, manifest=None, detect_binary=False):
+    from utils.ProjectStructureExtract import Extractor
+    extractor = Extractor(str(tree), detect_binary=detect_binary, manifest=manifest, scan_workers=scan_workers)
+    extractor.count_items()
+    return extractor
+
+def _export(fmt, tree, out_dir, read_workers, scan_workers, manifest=None):
+    from utils.JsonWriter import Writer
+    from utils.XmlWriter import XmlWriter
+    from utils.ProjectArchive import ArchiveWriter
+    writer_class = {"json": Writer, "xml": XmlWriter, "archive": ArchiveWriter}[fmt]
+    output = out_dir / _OUTPUT_FILES[fmt]
+    entries = _extractor(tree, scan_workers, manifest).extract_project_structure()
+    _drain(writer_class(read_workers, manifest=manifest).updateFile(output, entries))
+    return output
+
+def _restore(source, target, read_workers):
+    from utils.ProjectRestorer import ProjectRestorer
+    ok, message, stats = ProjectRestorer(source, target, read_workers).restore()
+    if not ok:
+        raise RuntimeError(message)
+    return stats
+
+def _run_stage(stage, tree, out_dir, read_workers, scan_workers):
+    """运行一个阶段，返回 (计时秒数, 附加信息)"""
+    extra = {}
+    if stage.startswith("restore_"):
+        source = _export(stage[len("restore_"):], tree, out_dir, read_workers, scan_workers)
+        start = time.perf_counter()
+        extra["restored"] = _restore(source, out_dir / "restored", read_workers)["files"]
+        return time.perf_counter() - start, extra
+
+    start = time.perf_counter()
+    if stage == "scan":
+        # 与 GUI 相同: 遍历时嗅探二进制文件
+        for _ in _extractor(tree, scan_workers, detect_binary=True).extract_project_structure():
+            pass
+    elif stage == "tree":
+        from utils.ProjectStructureTree import TreeBuilder
+        entries = _extractor(tree, scan_workers).extract_project_structure()
+        _drain(TreeBuilder(keep_content=False).buildTree(out_dir / "project_tree.md", entries))
+    elif stage in _OUTPUT_FILES:
+        _export(stage, tree, out_dir, read_workers, scan_workers)
+    elif stage == "all":
+        from utils.Pipeline import generate_all
+        entries = _extractor(tree, scan_workers).extract_project_structure()
+        _drain(generate_all(entries, out_dir, read_workers=read_workers))
+    elif stage == "incremental":
+        # 第一次生成建立扫描清单（不计时），只对项目未变化时的第二次生成计时
+        from utils.ScanManifest import ScanManifest
+        _export("json", tree, out_dir, read_workers, scan_workers, ScanManifest(out_dir, str(tree)))
+        start = time.perf_counter()
+        _export("json", tree, out_dir, read_workers, scan_workers, ScanManifest(out_dir, str(tree)))
+    elif stage == "roundtrip":
+        source = _export("json", tree, out_dir, read_workers, scan_workers)
+        extra["restored"] = _restore(source, out_dir / "restored", read_workers)["files"]
+    else:
+        raise ValueError(f"未知的阶段: {stage}")
+    return time.perf_counter() - start, extra
+
+def _worker(args):
+    out_dir = Path(args.out_dir)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    out_dir.mkdir(parents=True)
+    try:
+        # 各写入器的提示信息输出到 stderr，stdout 只留给结果
+        with redirect_stdout(sys.stderr):
+            seconds, extra = _run_stage(args.stage, Path(args.tree), out_dir, args.read_workers, args.scan_workers)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    print(json.dumps(dict(extra, seconds=seconds, peak_rss=peak_rss_bytes())))
+
+# ===== 主进程: 生成项目树、调度子进程、汇总结果 =====
+
+def _run_case(profile, stage, tree, work_dir, read_workers, scan_workers):
+    command = [sys.executable, "-m", "bench.ProjectBenchmark", "_worker", stage, str(tree),
+               str(Path(work_dir) / "out" / f"{profile}-{stage}"),
+               "--read-workers", str(read_workers), "--scan-workers", str(scan_workers)]
+    completed = subprocess.run(command, cwd=BASE_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, encoding="utf-8")
+    if completed.returncode != 0:
+        raise RuntimeError(f"{profile}/{stage} 运行失败:\n{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def run_benchmarks(profiles, stages, scale=1.0, repeat=DEFAULT_REPEAT, read_workers=None, scan_workers=1,
+                   work_dir=WORK_DIR, log=print):
+    """运行所有 (项目类型, 阶段) 组合，返回结果字典；每个组合取 repeat 次中最快的一次"""
+    from utils.ContentReader import DEFAULT_WORKERS
+    read_workers = read_workers or DEFAULT_WORKERS
+    results = {}
+    for profile in profiles:
+        log(f"准备合成项目: {profile} (scale={scale:g})")
+        tree, files, size = ensure_tree(work_dir, profile, scale)
+        for stage in stages:
+            runs = [_run_case(profile, stage, tree, work_dir, read_workers, scan_workers) for _ in range(max(1, repeat))]
+            seconds = min(run["seconds"] for run in runs)
+            peaks = [run["peak_rss"] for run in runs if run["peak_rss"] is not None]
+            result = {
+                "files": files,
+                "bytes": size,
+                "seconds": round(seconds, 4),
+                "runs": [round(run["seconds"], 4) for run in runs],
+                "files_per_s": round(files / seconds, 1) if seconds > 0 else None,
+                "mb_per_s": round(size / 1024 / 1024 / seconds, 2) if seconds > 0 else None,
+                "peak_rss": max(peaks) if peaks else None,
+            }
+            if "restored" in runs[0]:
+                result["restored"] = runs[0]["restored"]
+            results[f"{profile}/{stage}"] = result
+            log(_format_result(f"{profile}/{stage}", result))
+    return {
+        "version": RESULTS_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {"scale": scale, "repeat": repeat, "read_workers": read_workers, "scan_workers": scan_workers},
+        "results": results,
+    }
+
+def _format_mb(value):
+    return "-" if value is None else f"{value / 1024 / 1024:.1f} MB"
+
+def _format_result(name, result):
+    return (f"  {name:<24} {result['seconds']:>9.3f} s  {result['files_per_s'] or 0:>10.0f} 文件/s  "
+            f"{result['mb_per_s'] or 0:>8.2f} MB/s  峰值 {_format_mb(result['peak_rss'])}")
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    逐项比较耗时和峰值内存，超过基线 (1 + threshold) 倍视为回退。
+    返回 [(名称, 指标, 基线值, 当前值, 比值, 是否回退), ...]，只包含两边都有的项目。
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+    for name, result in current.get("results", {}).items():
+        base = base_results.get(name)
+        if base is None:
+            continue
+        for metric in ("seconds", "peak_rss"):
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            ratio = new / old
+            rows.append((name, metric, old, new, ratio, ratio > 1 + threshold))
+    return rows
+
+def _report_comparison(baseline, current, threshold, log=print):
+    if baseline.get("config", {}).get("scale") != current.get("config", {}).get("scale"):
+        log("警告: 基线与本次结果的 scale 不同，比较结果没有意义。")
+    rows = compare_results(baseline, current, threshold)
+    regressions = [row for row in rows if row[5]]
+    for name, metric, old, new, ratio, regressed in rows:
+        if metric == "seconds":
+            old_text, new_text = f"{old:.3f} s", f"{new:.3f} s"
+        else:
+            old_text, new_text = _format_mb(old), _format_mb(new)
+        mark = "  <-- 回退" if regressed else ""
+        log(f"  {name:<24} {metric:<9} {old_text:>12} -> {new_text:>12}  {ratio:6.2f}x{mark}")
+    log(f"共比较 {len(rows)} 项，{len(regressions)} 项回退（阈值 +{threshold:.0%}）。")
+    return regressions
+
+def _load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bench.ProjectBenchmark", description="项目结构生成器基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="运行基准测试")
+    run.add_argument("-o", "--output", help="结果 JSON 的保存路径")
+    run.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES), help="合成项目类型 (默认: 全部)")
+    run.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="要运行的阶段 (默认: 全部)")
+    run.add_argument("--scale", type=float, default=1.0, help="合成项目的规模系数 (默认: %(default)s)")
+    run.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每项重复次数，取最快的一次 (默认: %(default)s)")
+    run.add_argument("--read-workers", type=int, default=None, help="读取/还原线程数 (默认: 与导出相同)")
+    run.add_argument("--scan-workers", type=int, default=1, help="扫描进程数 (默认: %(default)s)")
+    run.add_argument("--work-dir", default=str(WORK_DIR), help="合成项目与临时输出所在目录 (默认: %(default)s)")
+    run.add_argument("--baseline", help="运行结束后与该基线结果比较")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="回退阈值 (默认: %(default)s，即慢 10%%)")
+
+    compare = subparsers.add_parser("compare", help="比较两次基准测试结果")
+    compare.add_argument("baseline", help="基线结果 JSON")
+    compare.add_argument("current", help="本次结果 JSON")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="回退阈值 (默认: %(default)s)")
+
+    worker = subparsers.add_parser("_worker", help=argparse.SUPPRESS)
+    worker.add_argument("stage", choices=STAGES)
+    worker.add_argument("tree")
+    worker.add_argument("out_dir")
+    worker.add_argument("--read-workers", type=int, required=True)
+    worker.add_argument("--scan-workers", type=int, default=1)
+    return parser
+
+def main(argv=None):
+    args = _build_parser().parse_args(argv)
+    if args.command == "_worker":
+        _worker(args)
+        return 0
+    if args.command == "compare":
+        regressions = _report_comparison(_load_results(args.baseline), _load_results(args.current), args.threshold)
+        return 1 if regressions else 0
+
+    results = run_benchmarks(args.profiles, args.stages, args.scale, args.repeat, args.read_workers,
+                             args.scan_workers, args.work_dir)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {Path(args.output).resolve()}")
+    if args.baseline:
+        return 1 if _report_comparison(_load_results(args.baseline), results, args.threshold) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
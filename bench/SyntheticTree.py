@@ -0,0 +1,138 @@
+"""
+确定性的合成项目树，供基准测试使用。同一 (profile, scale, SEED) 每次生成的目录结构和文件内容完全相同。
+
+    wide    很宽: 大量同级目录，每个目录几十个普通大小的源文件
+    deep    很深: 一条很深的目录链，每层若干文件
+    tiny    大量极小的文件
+    huge    少数几个很大的文本文件
+    binary  文本与二进制混合（已知二进制扩展名 + 需要嗅探的未知扩展名）
+    gbk     GBK 编码的中文文本，读取时走 utf-8 -> gbk 回退
+"""
+from pathlib import Path
+import json
+import os
+import random
+import shutil
+
+SEED = 20240601
+TREE_VERSION = 1
+
+_CODE_LINES = [
+    "def handle(request, *args, **kwargs):",
+    "    return self.render(request, context={'items': items})",
+    "import os, sys, json",
+    "class Node:",
+    "    __slots__ = ('parent', 'children', 'value')",
+    "for index, value in enumerate(values):",
+    "    total += value * weight[index]",
+    "# TODO: handle the empty case separately",
+    "if __name__ == '__main__':",
+    "const result = await fetch(url, { method: 'POST', body });",
+    "<div class=\"item\">{{ item.name }} &amp; {{ item.value }}</div>",
+    "SELECT id, name FROM users WHERE active = 1 ORDER BY name;",
+    "    raise ValueError(f\"unexpected value: {value!r}\")",
+    "",
+]
+_CHINESE_LINES = [
+    "项目结构生成器用于导出项目的目录树和文件内容。",
+    "这是一段使用 GBK 编码保存的中文注释，读取时需要回退解码。",
+    "配置文件中的路径、忽略目录和文件类型都会被保存。",
+    "还原项目时会按照相对路径重新创建所有文件。",
+]
+_TEXT_EXTENSIONS = [".py", ".md", ".txt", ".js", ".html", ".json"]
+
+def _text(rng, size, lines=_CODE_LINES):
+    parts = []
+    length = 0
+    while length < size:
+        line = rng.choice(lines)
+        parts.append(line)
+        length += len(line) + 1
+    return "\n".join(parts)[:size]
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    path.write_bytes(data)
+
+def _wide(root, rng, scale):
+    for d in range(max(1, int(200 * scale))):
+        for f in range(25):
+            _write(root / f"pkg{d:04d}" / f"mod{f:02d}{rng.choice(_TEXT_EXTENSIONS)}", _text(rng, rng.randint(200, 4000)))
+
+def _deep(root, rng, scale):
+    current = root
+    for level in range(max(2, int(100 * scale))):
+        for f in range(10):
+            _write(current / f"file{f}{rng.choice(_TEXT_EXTENSIONS)}", _text(rng, rng.randint(100, 2000)))
+        current = current / f"level{level:03d}"
+
+def _tiny(root, rng, scale):
+    for n in range(max(1, int(20000 * scale))):
+        _write(root / f"bucket{n % 100:02d}" / f"tiny{n:05d}.txt", _text(rng, rng.randint(0, 100)))
+
+def _huge(root, rng, scale):
+    size = max(64 * 1024, int(8 * 1024 * 1024 * scale))
+    block = _text(rng, 64 * 1024)
+    for n in range(4):
+        _write(root / f"huge{n}.txt", (block * (size // len(block) + 1))[:size])
+
+def _binary(root, rng, scale):
+    for n in range(max(4, int(3000 * scale))):
+        kind = n % 4
+        if kind < 2:
+            _write(root / f"dir{n % 30:02d}" / f"text{n:05d}.py", _text(rng, rng.randint(200, 3000)))
+        elif kind == 2:
+            # 已知二进制扩展名: 不打开文件即可判定
+            _write(root / f"dir{n % 30:02d}" / f"image{n:05d}.png", rng.randbytes(rng.randint(500, 20000)))
+        else:
+            # 未知扩展名: 需要读取头部嗅探出 NUL 字节
+            _write(root / f"dir{n % 30:02d}" / f"blob{n:05d}.dat", b"\x00" + rng.randbytes(rng.randint(500, 20000)))
+
+def _gbk(root, rng, scale):
+    for n in range(max(1, int(2000 * scale))):
+        _write(root / f"zh{n % 40:02d}" / f"doc{n:05d}.txt",
+               _text(rng, rng.randint(100, 2000), _CHINESE_LINES).encode('gbk'))
+
+PROFILES = {
+    "wide": _wide,
+    "deep": _deep,
+    "tiny": _tiny,
+    "huge": _huge,
+    "binary": _binary,
+    "gbk": _gbk,
+}
+
+def tree_stats(root):
+    """返回 (文件数, 总字节数)"""
+    files = 0
+    size = 0
+    for current, _, names in os.walk(root):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(current, name))
+    return files, size
+
+def ensure_tree(work_dir, profile, scale):
+    """生成（或复用已生成的）合成项目树，返回 (根目录, 文件数, 总字节数)"""
+    if profile not in PROFILES:
+        raise ValueError(f"未知的合成项目类型: {profile}（可选: {', '.join(PROFILES)}）")
+    root = Path(work_dir) / "trees" / f"{profile}-{scale:g}"
+    marker = root.with_name(root.name + ".json")
+    expected = {"version": TREE_VERSION, "profile": profile, "scale": scale, "seed": SEED}
+    try:
+        with open(marker, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        if all(info.get(key) == value for key, value in expected.items()) and root.is_dir():
+            return root, info["files"], info["bytes"]
+    except (OSError, ValueError):
+        pass
+
+    shutil.rmtree(root, ignore_errors=True)
+    root.mkdir(parents=True)
+    PROFILES[profile](root, random.Random(f"{SEED}-{profile}"), scale)
+    files, size = tree_stats(root)
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(dict(expected, files=files, bytes=size), f)
+    return root, files, size
@@ -0,0 +1,305 @@
+"""
+命令行入口: 不导入任何 GUI 模块 (ttkbootstrap)，可在 CI / 构建服务器上批量运行。
+
+    python __main__.py generate <ROOT> [<ROOT> ...] -o <RESULT_DIR> [-f json xml tree archive] [--set KEY=VALUE] [--stats -] [--watch]
+    python __main__.py restore <SOURCE> <TARGET> [--file REL_PATH ...] [--stats -]
+
+指定多个根目录时，每个根目录的结果输出到 <RESULT_DIR>/<根目录名>/ 下；根目录名相同时依次加上 -2、-3 ... 后缀。
+"""
+from configure.defaultSettings import SETTINGS_FILE
+from configure.settingsLoader import load_settings, parse_override
+from utils.ProjectStructureExtract import Extractor
+from utils.JsonWriter import Writer
+from utils.XmlWriter import XmlWriter
+from utils.ProjectStructureTree import TreeBuilder
+from utils.ProjectArchive import ArchiveWriter
+from utils.ShardedExport import make_writer, output_path_for, shard_budget
+from utils.ProjectRestorer import ProjectRestorer
+from utils.Pipeline import MultiSinkPipeline
+from utils.ScanManifest import ScanManifest
+from utils.BlobCache import shared_blob_cache
+from utils.HistoryLogger import log_action
+from utils.StageMetrics import StageMetrics
+from utils.ProjectWatcher import ProjectWatcher, output_excludes, watch
+from utils.RunProfiler import RunProfiler
+from contextlib import redirect_stdout
+from functools import partial
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+
+FORMATS = ("json", "xml", "tree", "archive")
+# "all" 包含的格式: 归档每次都要重新读取并压缩全部文件，无法复用增量清单，需显式指定 archive
+ALL_FORMATS = ("json", "xml", "tree")
+OUTPUT_KEYS = {"json": "CONTENT_FILE", "xml": "XML_FILE", "tree": "TREE_FILE", "archive": "ARCHIVE_FILE"}
+
+def _build_parser():
+    # 各子命令共用的选项
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--settings", default=SETTINGS_FILE, help="settings.json 路径 (默认: %(default)s)")
+    common.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="覆盖 settings.json 中的设置，VALUE 按 JSON 解析，可重复")
+    common.add_argument("--stats", metavar="FILE",
+                        help="把机器可读的 JSON 统计信息写入 FILE，'-' 表示标准输出（此时其他输出改写到标准错误）")
+    common.add_argument("--no-log", action="store_true", help="不写入 log/history.jsonl")
+    common.add_argument("--profile", action="store_true",
+                        help="性能分析: 把 cProfile 统计和 tracemalloc 内存报告保存到 log/profiles/ (覆盖 PROFILING)")
+
+    parser = argparse.ArgumentParser(prog="ProjectStructureExtractor", description="项目结构生成器（命令行模式）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", parents=[common], help="生成 JSON / XML / 目录树 / 压缩归档")
+    generate.add_argument("roots", nargs="+", metavar="ROOT", help="项目根目录，可指定多个")
+    generate.add_argument("-o", "--output", help="输出目录 (默认使用设置中的 RESULT_DIR)")
+    generate.add_argument("-f", "--format", nargs="+", choices=FORMATS + ("all",), default=["all"],
+                          help="要生成的格式 (默认: all，即 json xml tree；归档需显式指定 archive)")
+    generate.add_argument("--ignore-dir", action="append", default=[], help="追加忽略的目录名，可重复")
+    generate.add_argument("--ignore-type", action="append", default=[], help="追加忽略的文件扩展名，可重复")
+    gitignore = generate.add_mutually_exclusive_group()
+    gitignore.add_argument("--gitignore", dest="use_gitignore", action="store_const", const=True,
+                           help="遵循项目中各级 .gitignore (覆盖 USE_GITIGNORE，默认不遵循)")
+    gitignore.add_argument("--no-gitignore", dest="use_gitignore", action="store_const", const=False,
+                           help="不遵循项目中的 .gitignore (覆盖 USE_GITIGNORE)")
+    generate.add_argument("--workers", type=int, help="读取文件的并发线程数 (覆盖 READ_WORKERS)")
+    generate.add_argument("--scan-workers", type=int, help="并行扫描目录的进程数 (覆盖 SCAN_WORKERS)")
+    generate.add_argument("--metrics", action="store_true",
+                          help="在统计信息中记录各阶段耗时、读写字节数、解码方式和最慢的文件 (覆盖 STAGE_METRICS)")
+    generate.add_argument("--no-incremental", action="store_true", help="不使用扫描清单和内容缓存，完整重新生成")
+    generate.add_argument("--shard-bytes", type=int, help="把 JSON/XML 拆分为不超过该字节数的分片 (覆盖 SHARD_MAX_BYTES)")
+    generate.add_argument("--watch", action="store_true",
+                          help="生成后持续监视项目，文件变化后增量重新生成，按 Ctrl+C 停止 (间隔见 WATCH_INTERVAL)")
+    generate.add_argument("--shard-tokens", type=int, help="把 JSON/XML 拆分为不超过该近似 token 数的分片 (覆盖 SHARD_MAX_TOKENS)")
+
+    restore = commands.add_parser("restore", parents=[common], help="根据 JSON / XML / 归档文件还原项目")
+    restore.add_argument("source", help="要还原的 JSON、XML 或 .psa 归档文件")
+    restore.add_argument("target", help="还原到的目录")
+    restore.add_argument("--file", action="append", default=[], metavar="REL_PATH",
+                         help="只还原指定的相对路径，可重复；从归档还原时不会解压整个归档")
+    restore.add_argument("--workers", type=int, help="写入文件的并发线程数 (覆盖 READ_WORKERS)")
+    return parser
+
+def _load_settings(args):
+    settings = load_settings(args.settings)
+    for item in args.set:
+        key, value = parse_override(item)
+        settings[key] = value
+    if args.workers is not None:
+        settings["READ_WORKERS"] = args.workers
+    if args.profile:
+        settings["PROFILING"] = True
+    if args.command == "generate":
+        settings["IGNORE_DIRS"] = list(settings["IGNORE_DIRS"]) + args.ignore_dir
+        settings["IGNORE_FILE_TYPES"] = list(settings["IGNORE_FILE_TYPES"]) + args.ignore_type
+        if args.scan_workers is not None:
+            settings["SCAN_WORKERS"] = args.scan_workers
+        if args.metrics:
+            settings["STAGE_METRICS"] = True
+        if args.use_gitignore is not None:
+            settings["USE_GITIGNORE"] = args.use_gitignore
+        if args.no_incremental:
+            settings["INCREMENTAL"] = False
+        if args.shard_bytes is not None:
+            settings["SHARD_MAX_BYTES"] = args.shard_bytes
+        if args.shard_tokens is not None:
+            settings["SHARD_MAX_TOKENS"] = args.shard_tokens
+    return settings
+
+def _action_name(formats):
+    if tuple(formats) == ALL_FORMATS:
+        return "generate_all"
+    return "generate_" + "_".join(formats)
+
+def generate_root(root_dir, result_dir, formats, settings):
+    """为一个根目录生成所选格式的输出，返回包含各阶段耗时的统计信息"""
+    start_time = time.perf_counter()
+    incremental = settings["INCREMENTAL"]
+    manifest = ScanManifest(result_dir, root_dir) if incremental else None
+    blob_cache = shared_blob_cache(settings["BLOB_CACHE_MB"]) if incremental and settings["BLOB_CACHE_MB"] > 0 else None
+    workers = settings["READ_WORKERS"]
+    budget = shard_budget(settings["SHARD_MAX_BYTES"], settings["SHARD_MAX_TOKENS"])
+    metrics = StageMetrics() if settings["STAGE_METRICS"] else None
+
+    extractor = Extractor(root_dir, settings["IGNORE_DIRS"], settings["IGNORE_FILE_TYPES"],
+                          detect_binary=False, manifest=manifest, use_gitignore=settings["USE_GITIGNORE"],
+                          scan_workers=settings["SCAN_WORKERS"], metrics=metrics)
+    extractor.count_items()
+    scan_seconds = time.perf_counter() - start_time
+
+    pipeline = MultiSinkPipeline(workers, blob_cache, metrics)
+    outputs = {}
+    for fmt in formats:
+        path = Path(result_dir) / settings[OUTPUT_KEYS[fmt]]
+        if fmt in ("json", "xml"):
+            sink = make_writer(Writer if fmt == "json" else XmlWriter, workers, budget, manifest, metrics=metrics)
+            outputs[fmt] = str(output_path_for(path, budget))
+        elif fmt == "archive":
+            sink = ArchiveWriter(workers, settings["ARCHIVE_CODEC"], manifest=manifest, metrics=metrics)
+        else:
+            sink = TreeBuilder(keep_content=False, metrics=metrics)
+        pipeline.add(sink, path)
+        outputs.setdefault(fmt, str(path))
+
+    sink_stats = None
+    for result in pipeline.run(extractor.extract_project_structure()):
+        if not isinstance(result, (int, float)):
+            sink_stats = result
+
+    stats = dict(sink_stats[0])
+    stats["scan_seconds"] = round(scan_seconds, 4)
+    stats["duration"] = round(time.perf_counter() - start_time, 4)
+    stats["outputs"] = outputs
+    if metrics is not None:
+        stats["metrics"] = metrics.report()
+    stats["status"] = "success"
+    return stats
+
+def _result_dirs(roots, result_root):
+    """为每个根目录分配互不相同的输出目录"""
+    if len(roots) == 1:
+        return [Path(result_root)]
+    names = [Path(root_dir).resolve().name for root_dir in roots]
+    used = set()
+    result_dirs = []
+    for root_dir, name in zip(roots, names):
+        unique = name
+        number = 1
+        # 同名的根目录依次加后缀，同时避开其他根目录本身的名称
+        while unique in used or (unique != name and unique in names):
+            number += 1
+            unique = f"{name}-{number}"
+        if unique != name:
+            print(f"⚠ 根目录 {root_dir} 与之前的根目录同名，输出到 {unique}/")
+        used.add(unique)
+        result_dirs.append(Path(result_root) / unique)
+    return result_dirs
+
+def _run_generate(args, settings):
+    requested = set(ALL_FORMATS) | set(args.format) if "all" in args.format else set(args.format)
+    formats = [fmt for fmt in FORMATS if fmt in requested]
+    result_root = args.output or settings["RESULT_DIR"]
+    if not result_root:
+        raise ValueError("请通过 -o/--output 或 RESULT_DIR 设置指定输出目录")
+    action_name = _action_name(formats)
+
+    results = []
+    targets = []
+    # 多个根目录时按根目录名分别输出，避免互相覆盖
+    for root_dir, result_dir in zip(args.roots, _result_dirs(args.roots, result_root)):
+        start_time = time.perf_counter()
+        profiler = RunProfiler(action_name) if settings["PROFILING"] else None
+        try:
+            if not Path(root_dir).is_dir():
+                raise NotADirectoryError(f"项目根目录不存在: {root_dir}")
+            if profiler is None:
+                stats = generate_root(root_dir, result_dir, formats, settings)
+            else:
+                stats = profiler.run(generate_root, root_dir, result_dir, formats, settings)
+        except Exception as e:
+            stats = {"duration": round(time.perf_counter() - start_time, 4), "status": "error", "message": str(e)}
+            print(f"❌ 处理 {root_dir} 时出错: {e}", file=sys.stderr)
+        if profiler is not None and profiler.report is not None:
+            stats["profile"] = profiler.report
+
+        if not args.no_log:
+            log_action(action_name, root_dir, str(result_dir), settings["IGNORE_DIRS"], settings["IGNORE_FILE_TYPES"], stats)
+        results.append({"action": action_name, "root_dir": root_dir, "result_dir": str(result_dir), "stats": stats})
+        if stats["status"] == "success":
+            targets.append((root_dir, result_dir))
+
+    if args.watch and targets:
+        _watch(targets, formats, settings, log=not args.no_log)
+    return results
+
+def _watch(targets, formats, settings, log=True):
+    """监视各根目录，变化稳定后增量重新生成，直到按下 Ctrl+C。归档每次都要读取全部文件，不随变化重新生成"""
+    if "archive" in formats:
+        formats = [fmt for fmt in formats if fmt != "archive"]
+        print("ℹ️ 监视模式不会重新生成归档（每次都需读取全部文件），需要时请单独运行 -f archive")
+        if not formats:
+            return
+    action_name = _action_name(formats)
+    watchers = []
+    for root_dir, result_dir in targets:
+        def regenerate(changed_paths, root_dir=root_dir, result_dir=result_dir):
+            start_time = time.perf_counter()
+            profiler = RunProfiler(action_name) if settings["PROFILING"] else None
+            try:
+                if profiler is None:
+                    stats = generate_root(root_dir, result_dir, formats, settings)
+                else:
+                    stats = profiler.run(generate_root, root_dir, result_dir, formats, settings)
+                print(f"🔄 {root_dir}: 检测到 {len(changed_paths)} 处变化，已重新生成 (耗时 {stats['duration']}s)")
+            except Exception as e:
+                stats = {"duration": round(time.perf_counter() - start_time, 4), "status": "error", "message": str(e)}
+                print(f"❌ 重新生成 {root_dir} 时出错: {e}", file=sys.stderr)
+            stats["changed"] = len(changed_paths)
+            if profiler is not None and profiler.report is not None:
+                stats["profile"] = profiler.report
+            if log:
+                log_action(action_name, root_dir, str(result_dir), settings["IGNORE_DIRS"], settings["IGNORE_FILE_TYPES"], stats)
+
+        # 每次轮询都要扫描一遍，单进程即可；并行扫描只在重新生成时使用
+        make_extractor = partial(Extractor, root_dir, settings["IGNORE_DIRS"], settings["IGNORE_FILE_TYPES"],
+                                 detect_binary=False, use_gitignore=settings["USE_GITIGNORE"], scan_workers=1,
+                                 keep_stat=True)
+        exclude = output_excludes(root_dir, result_dir, [settings[OUTPUT_KEYS[fmt]] for fmt in formats])
+        watchers.append(ProjectWatcher(make_extractor, regenerate, settings["WATCH_DEBOUNCE"], exclude))
+
+    print(f"正在监视 {len(watchers)} 个项目的变化，按 Ctrl+C 停止...")
+    try:
+        watch(watchers, interval=settings["WATCH_INTERVAL"])
+    except KeyboardInterrupt:
+        print("已停止监视。")
+
+def _run_restore(args, settings):
+    start_time = time.perf_counter()
+    restorer = ProjectRestorer(args.source, args.target, settings["READ_WORKERS"], args.file)
+    profiler = RunProfiler("restore_project") if settings["PROFILING"] else None
+    success, message, stats = restorer.restore() if profiler is None else profiler.run(restorer.restore)
+    if success and stats.get("failed"):
+        # 部分文件写入失败: 以非零退出码结束，脚本才能发现还原不完整
+        stats["status"] = "partial"
+        print(f"⚠ 有 {stats['failed']} 个文件还原失败", file=sys.stderr)
+    elif success:
+        stats["status"] = "success"
+    else:
+        stats = {"status": "error", "message": message}
+    stats["duration"] = round(time.perf_counter() - start_time, 4)
+    if profiler is not None:
+        stats["profile"] = profiler.report
+    if not args.no_log:
+        log_action("restore_project", "N/A", args.target, [], [], stats)
+    return [{"action": "restore_project", "source": args.source, "result_dir": args.target, "stats": stats}]
+
+def main(argv=None):
+    started = time.perf_counter()
+    args = _build_parser().parse_args(argv)
+    stats_to_stdout = args.stats == "-"
+
+    # 统计信息写到标准输出时，把各模块的提示信息改写到标准错误，保证 stdout 只有 JSON
+    with redirect_stdout(sys.stderr if stats_to_stdout else sys.stdout):
+        try:
+            settings = _load_settings(args)
+        except (ValueError, OSError, json.JSONDecodeError) as e:
+            print(f"加载设置失败: {e}", file=sys.stderr)
+            return 2
+        if args.command == "generate":
+            results = _run_generate(args, settings)
+        else:
+            results = _run_restore(args, settings)
+
+    summary = {
+        "command": args.command,
+        "results": results,
+        "total_seconds": round(time.perf_counter() - started, 4),
+    }
+    if args.stats:
+        text = json.dumps(summary, ensure_ascii=False, indent=2)
+        if stats_to_stdout:
+            print(text)
+        else:
+            Path(args.stats).write_text(text, encoding="utf-8")
+
+    return 0 if all(item["stats"].get("status") == "success" for item in results) else 1
@@ -81,7 +81,32 @@ DEFAULT_SETTINGS = {
     ".exe",      # 可执行程序
     ".msi"       # 安装文件
     ],
+    # 遵循项目中各级 .gitignore 的规则，被忽略的目录整棵跳过；默认关闭，避免在不知情时漏掉文件
+    "USE_GITIGNORE": False,
     "TREE_FILE": "project_tree.md",
     "CONTENT_FILE": "project_content.json",
-    "XML_FILE": "project_content.xml"
+    "XML_FILE": "project_content.xml",
+    # 分块压缩的二进制归档及其压缩方式 ("zlib" 或 "lzma")
+    "ARCHIVE_FILE": "project_content.psa",
+    "ARCHIVE_CODEC": "zlib",
+    # JSON/XML 分片导出的预算: 单个分片的最大字节数 / 近似 token 数 (约 4 字节一个 token)，均为 0 表示不分片
+    "SHARD_MAX_BYTES": 0,
+    "SHARD_MAX_TOKENS": 0,
+    # 在历史记录的统计信息中记录各阶段耗时、读写字节数、解码方式和最慢的文件
+    "STAGE_METRICS": False,
+    # 性能分析: 每次生成/还原时保存 cProfile 统计和 tracemalloc 内存报告到 log/profiles/，并在历史记录中链接 (运行会变慢)
+    "PROFILING": False,
+    # 监视模式: 轮询间隔 (秒) 与变化稳定多久 (秒) 后才重新生成
+    "WATCH_INTERVAL": 1.0,
+    "WATCH_DEBOUNCE": 0.5,
+    # 并行扫描目录的进程数: 根目录下的各个子目录分给多个进程扫描 (1 表示单进程扫描)
+    "SCAN_WORKERS": 1,
+    # 读取/解码文件内容的并发线程数 (1 表示串行读取)
+    "READ_WORKERS": 8,
+    # 增量生成: 在输出目录中保存扫描清单，未变化的文件直接复用上次的结果
+    "INCREMENTAL": True,
+    # 解码后文本的内容寻址缓存上限 (MB)，默认 0 即不使用缓存。开启后项目文件的解码内容会复制到当前用户的缓存目录中
+    # (Windows: %LOCALAPPDATA%\ProjectStructureExtractor\blobs，macOS: ~/Library/Caches/...，其他: ~/.cache/...)，
+    # 删除项目后仍会保留到被淘汰为止；以 . 开头的文件和目录（如 .env、.aws/）中的内容不会写入缓存
+    "BLOB_CACHE_MB": 0
 }
\ No newline at end of file
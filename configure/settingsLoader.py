@@ -0,0 +1,26 @@
+import json
+import os
+from configure.defaultSettings import SETTINGS_FILE, DEFAULT_SETTINGS
+
+def load_settings(settings_file=SETTINGS_FILE):
+    """
+    读取 settings.json 并用默认值补全缺失项，不依赖任何 GUI 模块。
+    文件不存在时直接返回默认设置（不会创建文件）。
+    """
+    settings = json.loads(json.dumps(DEFAULT_SETTINGS))
+    settings["THEME"] = "litera"
+    if settings_file and os.path.exists(settings_file):
+        with open(settings_file, "r", encoding="utf-8") as f:
+            settings.update(json.load(f))
+    return settings
+
+def parse_override(text):
+    """把 KEY=VALUE 形式的覆盖项解析为 (key, value)，VALUE 优先按 JSON 解析"""
+    if "=" not in text:
+        raise ValueError(f"无效的设置覆盖项: {text}（应为 KEY=VALUE）")
+    key, raw_value = text.split("=", 1)
+    try:
+        value = json.loads(raw_value)
+    except json.JSONDecodeError:
+        value = raw_value
+    return key.strip(), value
@@ -4,9 +4,19 @@ from tkinter import filedialog, messagebox
 from utils.JsonWriter import Writer
 from utils.XmlWriter import XmlWriter
 from utils.ProjectStructureTree import TreeBuilder
+from utils.ProjectArchive import ArchiveWriter
+from utils.ShardedExport import make_writer, output_path_for, shard_budget
 from utils.ProjectRestorer import ProjectRestorer
 from utils.HistoryLogger import log_action, read_recent_paths
-from utils.ProjectStructureExtract import Extractor
+from utils.ProjectStructureExtract import Extractor, ScanCancelled
+from utils.ScanManifest import ScanManifest
+from utils.BlobCache import shared_blob_cache
+from utils.Pipeline import generate_all
+from utils.StageMetrics import StageMetrics
+from utils.ProjectWatcher import ProjectWatcher, output_excludes, watch
+from utils.CountCache import CountCache
+from utils.RunProfiler import RunProfiler, PROFILE_DIR
+from functools import partial
 from pathlib import Path
 import json
 import os
@@ -15,8 +25,10 @@ import subprocess
 import time
 import random
 import threading
+import queue
 from datetime import datetime
 from configure.defaultSettings import *
+from configure.settingsLoader import load_settings
 
 def get_system_theme():
     try:
@@ -34,6 +46,14 @@ def get_system_theme():
         pass
     return "light"
 
+PROGRESS_INTERVAL = 1 / 30   # 后台任务最多每秒发送约 30 次进度事件
+POLL_INTERVAL_MS = 33        # 界面轮询后台任务队列的间隔
+WATCH_POLL_MS = 250          # 监视模式下界面检查变化通知的间隔
+COUNT_DEBOUNCE_MS = 300      # 根目录输入停止变化这么久之后才开始后台计数
+
+class JobCancelled(Exception):
+    pass
+
 def resource_path(relative_path):
     try:
         base_path = sys._MEIPASS
@@ -63,6 +83,19 @@ class ProjectStructureApp:
         self.tree_file = self.settings["TREE_FILE"]
         self.content_file = self.settings["CONTENT_FILE"]
         self.xml_file = self.settings["XML_FILE"]
+        self.archive_file = self.settings["ARCHIVE_FILE"]
+        self.archive_codec = self.settings["ARCHIVE_CODEC"]
+        self.shard_max_bytes = self.settings["SHARD_MAX_BYTES"]
+        self.shard_max_tokens = self.settings["SHARD_MAX_TOKENS"]
+        self.read_workers = self.settings["READ_WORKERS"]
+        self.incremental = self.settings["INCREMENTAL"]
+        self.blob_cache_mb = self.settings["BLOB_CACHE_MB"]
+        self.use_gitignore = self.settings["USE_GITIGNORE"]
+        self.scan_workers = self.settings["SCAN_WORKERS"]
+        self.watch_interval = self.settings["WATCH_INTERVAL"]
+        self.watch_debounce = self.settings["WATCH_DEBOUNCE"]
+        self.stage_metrics = self.settings["STAGE_METRICS"]
+        self.profiling = self.settings["PROFILING"]
         self.ignore_dirs = list(self.settings["IGNORE_DIRS"])
         self.ignore_file_types = list(self.settings["IGNORE_FILE_TYPES"])
         
@@ -73,12 +106,33 @@ class ProjectStructureApp:
         self.result_dir_var = ttk.StringVar(value=self.settings["RESULT_DIR"])
         self.status_var = ttk.StringVar()
         self.file_count_var = ttk.StringVar()
+        self.profiling_var = ttk.BooleanVar(value=self.profiling)
+        self.gitignore_var = ttk.BooleanVar(value=self.use_gitignore)
         self.tip_update_job = None
 
+        # 后台生成任务: 工作线程只通过队列与界面通信，由 root.after 轮询
+        self.job_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.job_thread = None
+
+        # 监视模式: 监视线程只把变化的路径放进 watch_queue，由界面在空闲时触发“生成全部”
+        self.watch_var = ttk.BooleanVar(value=False)
+        self.watch_queue = queue.Queue()
+        self.watch_stop = None
+        self.watch_pending = set()
+
+        # 后台计数: 输入停止变化后才开始，新的计数会取消仍在进行的旧计数；结果经 count_queue 交给界面线程
+        self.count_cache = CountCache()
+        self.count_queue = queue.Queue()
+        self.count_job = None
+        self.count_cancel = None
+        self.count_generation = 0
+
         self._build_ui()
         self._update_recent_menus()
         
         self.root_dir_var.trace_add("write", self._on_root_dir_change)
+        self.result_dir_var.trace_add("write", self._on_result_dir_change)
         
         self._set_greeting()
         self._schedule_tip_update()
@@ -89,34 +143,32 @@ class ProjectStructureApp:
         self.root.mainloop()
 
     def _load_settings(self):
-        self.default_settings = {
-            "ROOT_DIR": DEFAULT_SETTINGS["ROOT_DIR"], "RESULT_DIR": DEFAULT_SETTINGS["RESULT_DIR"],
-            "IGNORE_DIRS": DEFAULT_SETTINGS["IGNORE_DIRS"], "IGNORE_FILE_TYPES": DEFAULT_SETTINGS["IGNORE_FILE_TYPES"],
-            "TREE_FILE": DEFAULT_SETTINGS["TREE_FILE"], "CONTENT_FILE": DEFAULT_SETTINGS["CONTENT_FILE"],
-            "XML_FILE": DEFAULT_SETTINGS["XML_FILE"], "THEME": "litera" 
-        }
+        # 默认值只在 configure.defaultSettings 中维护一份，与命令行模式共用同一个加载函数
         if not os.path.exists(SETTINGS_FILE):
-            system_theme = get_system_theme()
-            self.default_settings["THEME"] = "cyborg" if system_theme == 'dark' else "litera"
+            settings = load_settings(None)
+            settings["THEME"] = "cyborg" if get_system_theme() == 'dark' else "litera"
             with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.default_settings, f, indent=2, ensure_ascii=False)
-            return dict(self.default_settings)
+                json.dump(settings, f, indent=2, ensure_ascii=False)
+            return settings
         try:
-            with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            for key, val in self.default_settings.items():
-                if key not in data: data[key] = val
-            return data
+            return load_settings(SETTINGS_FILE)
         except Exception as e:
             messagebox.showerror("错误", f"加载配置文件失败: {e}")
-            return dict(self.default_settings)
+            return load_settings(None)
 
     def _save_settings(self):
         data = {
             "ROOT_DIR": self.default_root_dir, "RESULT_DIR": self.default_result_dir,
             "IGNORE_DIRS": self.ignore_dirs, "IGNORE_FILE_TYPES": self.ignore_file_types,
             "TREE_FILE": self.tree_file, "CONTENT_FILE": self.content_file,
-            "XML_FILE": self.xml_file, "THEME": self.root.style.theme.name
+            "XML_FILE": self.xml_file, "THEME": self.root.style.theme.name,
+            "ARCHIVE_FILE": self.archive_file, "ARCHIVE_CODEC": self.archive_codec,
+            "SHARD_MAX_BYTES": self.shard_max_bytes, "SHARD_MAX_TOKENS": self.shard_max_tokens,
+            "READ_WORKERS": self.read_workers, "INCREMENTAL": self.incremental,
+            "BLOB_CACHE_MB": self.blob_cache_mb, "USE_GITIGNORE": self.use_gitignore,
+            "SCAN_WORKERS": self.scan_workers,
+            "WATCH_INTERVAL": self.watch_interval, "WATCH_DEBOUNCE": self.watch_debounce,
+            "STAGE_METRICS": self.stage_metrics, "PROFILING": self.profiling
         }
         with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
@@ -133,6 +185,10 @@ class ProjectStructureApp:
         
         help_btn = ttk.Button(header_frame, text="❓", command=self._show_help_window, bootstyle="secondary-outline")
         help_btn.pack(side="right", padx=5)
+        diagnose_menu = ttk.Menu(self.root, tearoff=0)
+        diagnose_menu.add_checkbutton(label="性能分析 (cProfile + tracemalloc)", variable=self.profiling_var, command=self._toggle_profiling)
+        diagnose_menu.add_command(label="打开性能分析报告目录", command=self._open_profile_dir)
+        ttk.Menubutton(header_frame, text="诊断", menu=diagnose_menu, bootstyle="secondary-outline").pack(side="right")
         self.theme_toggle_btn = ttk.Button(header_frame, text="🌙" if self.root.style.theme.name == "litera" else "☀️", command=self._toggle_theme, bootstyle="secondary-outline")
         self.theme_toggle_btn.pack(side="right")
         
@@ -149,6 +205,8 @@ class ProjectStructureApp:
         self.root_recent_btn.grid(row=0, column=4, padx=5)
         
         ttk.Label(frame, textvariable=self.file_count_var, bootstyle="secondary").grid(row=1, column=1, sticky='w', padx=5)
+        ttk.Checkbutton(frame, text="遵循 .gitignore", variable=self.gitignore_var, command=self._toggle_gitignore,
+                        bootstyle="round-toggle").grid(row=1, column=2, columnspan=3, sticky='e', padx=5)
 
         ttk.Label(frame, text="输出目录:").grid(row=2, column=0, sticky="w", pady=2)
         ttk.Entry(frame, textvariable=self.result_dir_var).grid(row=2, column=1, padx=5, sticky="ew")
@@ -169,11 +227,19 @@ class ProjectStructureApp:
         ttk.Button(btn_frame, text="生成 JSON", width=12, command=self._generate_json, bootstyle="success").grid(row=0, column=0, padx=5)
         ttk.Button(btn_frame, text="生成 XML", width=12, command=self._generate_xml, bootstyle="primary").grid(row=0, column=1, padx=5)
         ttk.Button(btn_frame, text="生成 Tree", width=12, command=self._generate_tree, bootstyle="info").grid(row=0, column=2, padx=5)
-        ttk.Button(btn_frame, text="还原项目", width=12, command=self._restore_project, bootstyle="danger").grid(row=0, column=3, padx=5)
-        ttk.Button(btn_frame, text="重置设置", width=12, command=self._reset_to_default_settings, bootstyle="warning-outline").grid(row=0, column=4, padx=5)
-        
-        self.progress_bar = ttk.Progressbar(self.root, mode='determinate')
-        self.progress_bar.pack(fill='x', padx=20, pady=(0, 5))
+        ttk.Button(btn_frame, text="生成归档", width=12, command=self._generate_archive, bootstyle="dark").grid(row=0, column=3, padx=5)
+        ttk.Button(btn_frame, text="生成全部", width=12, command=self._generate_all, bootstyle="secondary").grid(row=0, column=4, padx=5)
+        ttk.Button(btn_frame, text="还原项目", width=12, command=self._restore_project, bootstyle="danger").grid(row=0, column=5, padx=5)
+        ttk.Button(btn_frame, text="重置设置", width=12, command=self._reset_to_default_settings, bootstyle="warning-outline").grid(row=0, column=6, padx=5)
+        
+        progress_frame = ttk.Frame(self.root)
+        progress_frame.pack(fill='x', padx=20, pady=(0, 5))
+        self.progress_bar = ttk.Progressbar(progress_frame, mode='determinate')
+        self.progress_bar.pack(side="left", fill='x', expand=True)
+        self.cancel_btn = ttk.Button(progress_frame, text="取消", width=6, command=self._cancel_job, bootstyle="danger-outline", state="disabled")
+        self.cancel_btn.pack(side="right", padx=(5, 0))
+        ttk.Checkbutton(progress_frame, text="监视", variable=self.watch_var, command=self._toggle_watch,
+                        bootstyle="info-round-toggle").pack(side="right", padx=(10, 0))
         
         ttk.Label(self.root, textvariable=self.status_var, anchor="w").pack(side="bottom", fill="x", padx=20, pady=5)
 
@@ -243,27 +309,109 @@ class ProjectStructureApp:
         self._schedule_tip_update()
 
     def _on_root_dir_change(self, *args):
-        self._start_background_count()
+        if self.watch_var.get():
+            self.watch_var.set(False)
+            self._stop_watch()
+        self._schedule_background_count()
+
+    def _on_result_dir_change(self, *args):
+        # 监视时跳过的输出文件由开始监视时的输出目录决定，输出目录变化后需重新打开监视
+        if self.watch_var.get():
+            self.watch_var.set(False)
+            self._stop_watch()
+            self.status_var.set("输出目录已变化，已停止监视")
+
+    def _schedule_background_count(self):
+        # 每次输入都重新计时，输入停止 COUNT_DEBOUNCE_MS 后才真正开始计数
+        if self.count_job:
+            self.root.after_cancel(self.count_job)
+        self.count_job = self.root.after(COUNT_DEBOUNCE_MS, self._start_background_count)
 
     def _start_background_count(self):
-        thread = threading.Thread(target=self._background_count_task, daemon=True)
-        thread.start()
-
-    def _background_count_task(self):
+        self.count_job = None
+        self._cancel_background_count()
+        self.count_generation += 1
         path = self.root_dir_var.get()
-        if os.path.isdir(path):
-            self.file_count_var.set("正在计算...")
-            try:
-                active_ignore_dirs = self._get_active_ignores(self.ignore_dir_vars)
-                active_ignore_types = self._get_active_ignores(self.ignore_type_vars)
-                extractor = Extractor(path, active_ignore_dirs, active_ignore_types)
+        if not os.path.isdir(path):
+            self.file_count_var.set("")
+            return
+
+        self.file_count_var.set("正在计算...")
+        self.count_cancel = threading.Event()
+        # 忽略设置在界面线程中读取，后台线程不访问任何 Tk 对象
+        args = (self.count_generation, self.count_cancel, path, self._get_active_ignores(self.ignore_dir_vars),
+                self._get_active_ignores(self.ignore_type_vars), self.use_gitignore)
+        threading.Thread(target=self._background_count_task, args=args, daemon=True).start()
+        self.root.after(POLL_INTERVAL_MS, self._poll_count_queue, self.count_generation)
+
+    def _cancel_background_count(self):
+        if self.count_cancel is not None:
+            self.count_cancel.set()
+            self.count_cancel = None
+
+    def _background_count_task(self, generation, cancel_event, path, ignore_dirs, ignore_types, use_gitignore):
+        """后台线程: 先查缓存，未命中再扫描；被新的计数取消时直接退出"""
+        key = CountCache.key(path, ignore_dirs, ignore_types, use_gitignore)
+        try:
+            count = self.count_cache.lookup(key)
+            if count is None:
+                extractor = Extractor(path, ignore_dirs, ignore_types, use_gitignore=use_gitignore,
+                                      cancel_event=cancel_event, record_mtimes=True)
                 count = extractor.count_items()
-                self.file_count_var.set(f"（检测到约 {count} 个项目）")
-            except Exception as e:
-                self.file_count_var.set("(计算失败)")
-                print(f"后台计数失败: {e}")
+                self.count_cache.store(key, count, extractor.validation_mtimes())
+            text = f"（检测到约 {count} 个项目）"
+        except ScanCancelled:
+            return
+        except Exception as e:
+            text = "(计算失败)"
+            print(f"后台计数失败: {e}")
+        self.count_queue.put((generation, text))
+
+    def _poll_count_queue(self, generation):
+        # 已被新的计数取代: 由新计数自己的轮询接手
+        if generation != self.count_generation:
+            return
+        try:
+            while True:
+                result_generation, text = self.count_queue.get_nowait()
+                if result_generation == generation:
+                    self.file_count_var.set(text)
+                    self.count_cancel = None
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(POLL_INTERVAL_MS, self._poll_count_queue, generation)
+
+    def _toggle_gitignore(self):
+        self.use_gitignore = self.gitignore_var.get()
+        self._save_settings()
+        if self.use_gitignore:
+            self.status_var.set("已开启: 遵循项目中的 .gitignore，被忽略的文件不会导出")
         else:
-            self.file_count_var.set("")
+            self.status_var.set("已关闭: 不遵循 .gitignore，只按忽略列表过滤")
+        self._schedule_tip_update(5000)
+        self._schedule_background_count()
+
+    def _toggle_profiling(self):
+        self.profiling = self.profiling_var.get()
+        self._save_settings()
+        if self.profiling:
+            self.status_var.set("🔬 已开启性能分析: 之后每次生成和还原都会在 log/profiles/ 中保存报告（运行会变慢）")
+        else:
+            self.status_var.set("已关闭性能分析")
+        self._schedule_tip_update(5000)
+
+    def _open_profile_dir(self):
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        try:
+            if sys.platform == "win32":
+                os.startfile(PROFILE_DIR)
+            elif sys.platform == "darwin":
+                subprocess.Popen(["open", str(PROFILE_DIR)])
+            else:
+                subprocess.Popen(["xdg-open", str(PROFILE_DIR)])
+        except Exception as e:
+            messagebox.showerror("错误", f"无法打开目录 {PROFILE_DIR}:\n{e}")
 
     def _set_root_default(self):
         self.default_root_dir = self.root_dir_var.get().strip()
@@ -328,110 +476,214 @@ class ProjectStructureApp:
         
         return root_dir, result_dir, active_ignore_dirs, active_ignore_types
 
-    def _execute_and_log(self, action_name, action_func, is_generator=False):
+    def _load_manifest(self, root_dir, result_dir):
+        """增量模式下加载输出目录中的扫描清单"""
+        if not self.incremental:
+            return None
+        return ScanManifest(result_dir, root_dir)
+
+    def _open_blob_cache(self):
+        """增量模式下打开共享的解码文本缓存，JSON 与 XML 导出共用"""
+        if not self.incremental or self.blob_cache_mb <= 0:
+            return None
+        return shared_blob_cache(self.blob_cache_mb)
+
+    def _execute_and_log(self, action_name, action_func, on_success):
+        """
+        在后台线程中执行生成任务: action_func(entries_generator, manifest, metrics) 是一个生成器，
+        先yield进度，最后yield (stats, *results)。成功后在主线程中调用 on_success(stats, results)。
+        """
+        if self.job_thread is not None and self.job_thread.is_alive():
+            messagebox.showwarning("提示", "已有任务正在运行，请等待完成或先取消。")
+            return
+
         params = self._get_common_generation_params()
-        if not params or not params[0]: return None, []
+        if not params or not params[0]: return
         
         root_dir, result_dir, ignores, ignore_types = params
-        start_time = time.time()
-        
+        job = {
+            "action_name": action_name, "root_dir": root_dir, "result_dir": result_dir,
+            "ignores": ignores, "ignore_types": ignore_types,
+            "on_success": on_success, "start_time": time.time(),
+        }
+
+        self.status_var.set("正在计算文件总数...")
+        self.progress_bar.config(mode='indeterminate')
+        self.progress_bar.start(10)
+        self.cancel_btn.config(state="normal")
+        self.cancel_event.clear()
+
+        self.job_thread = threading.Thread(target=self._run_job, args=(action_func, job), daemon=True)
+        self.job_thread.start()
+        self.root.after(POLL_INTERVAL_MS, self._poll_job_queue, job)
+
+    def _run_job(self, action_func, job):
+        """后台线程: 执行扫描和生成，只通过 job_queue 向界面发送事件，不直接操作任何 Tk 对象"""
+        profiler = RunProfiler(job["action_name"]) if self.profiling else None
+        try:
+            if profiler is None:
+                outcome = ("done", self._job_steps(action_func, job))
+            else:
+                outcome = ("done", profiler.run(self._job_steps, action_func, job))
+        except (JobCancelled, ScanCancelled):
+            outcome = ("cancelled", None)
+        except Exception as e:
+            outcome = ("error", e)
+        if profiler is not None:
+            # 在发送结果之前记录，界面线程收到结果时一定能读到
+            job["profile"] = profiler.report
+        self.job_queue.put(outcome)
+
+    def _job_steps(self, action_func, job):
+        """扫描并执行 action_func，返回 (stats, other_results)；取消时抛出 JobCancelled / ScanCancelled"""
+        manifest = self._load_manifest(job["root_dir"], job["result_dir"])
+        metrics = StageMetrics() if self.stage_metrics else None
+        # 二进制嗅探交给 Writer 的并发读取阶段完成，遍历阶段不再逐个打开文件
+        extractor = Extractor(job["root_dir"], job["ignores"], job["ignore_types"], detect_binary=False, manifest=manifest,
+                              use_gitignore=self.use_gitignore, scan_workers=self.scan_workers,
+                              metrics=metrics, cancel_event=self.cancel_event)
+        extractor.count_items()
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+        self.job_queue.put(("counted", None))
+
+        stats = {}
+        other_results = []
+        last_post = 0.0
+
+        action_generator = action_func(extractor.extract_project_structure(), manifest, metrics)
         try:
-            extractor = Extractor(root_dir, ignores, ignore_types)
-            
-            self.status_var.set("正在计算文件总数...")
-            self.progress_bar.config(mode='indeterminate')
-            self.progress_bar.start(10)
-            self.root.update_idletasks()
-            
-            extractor.count_items()
-            
-            self.progress_bar.stop()
-            self.progress_bar.config(mode='determinate')
-            self.status_var.set("正在处理文件...")
-            
-            stats = {}
-            other_results = []
-            
-            action_generator = action_func(extractor.extract_project_structure())
             for result in action_generator:
+                if self.cancel_event.is_set():
+                    raise JobCancelled()
                 if isinstance(result, (int, float)):
-                    self.progress_bar['value'] = result
-                    self.root.update_idletasks()
+                    # 合并进度事件，避免每个文件都触发一次重绘
+                    now = time.monotonic()
+                    if now - last_post >= PROGRESS_INTERVAL:
+                        last_post = now
+                        self.job_queue.put(("progress", result))
                 else:
                     stats, *other_results = result
+        finally:
+            # 取消时关闭生成器，Writer 会丢弃临时文件，保留原有输出
+            action_generator.close()
 
-            duration = round(time.time() - start_time, 2)
+        if metrics is not None:
+            stats = dict(stats, metrics=metrics.report())
+
+        return stats, other_results
+
+    def _poll_job_queue(self, job):
+        latest_progress = None
+        outcome = None
+        try:
+            while outcome is None:
+                kind, payload = self.job_queue.get_nowait()
+                if kind == "counted":
+                    self.progress_bar.stop()
+                    self.progress_bar.config(mode='determinate')
+                    self.status_var.set("正在处理文件...")
+                elif kind == "progress":
+                    latest_progress = payload
+                else:
+                    outcome = (kind, payload)
+        except queue.Empty:
+            pass
+
+        if latest_progress is not None:
+            self.progress_bar['value'] = latest_progress
+        if outcome is None:
+            self.root.after(POLL_INTERVAL_MS, self._poll_job_queue, job)
+        else:
+            self._finish_job(job, *outcome)
+
+    def _finish_job(self, job, kind, payload):
+        action_name = job["action_name"]
+        duration = round(time.time() - job["start_time"], 2)
+        self.job_thread = None
+        self.cancel_btn.config(state="disabled")
+        self.progress_bar.stop()
+        self.progress_bar['value'] = 0
+
+        if kind == "done":
+            stats, other_results = payload
             stats['duration'] = duration
             stats['status'] = 'success'
-            
-            log_action(action_name, root_dir, result_dir, ignores, ignore_types, stats)
-            self._update_recent_menus()
-            
-            return stats, other_results
+        elif kind == "cancelled":
+            stats = { 'duration': duration, 'status': 'cancelled' }
+        else:
+            stats = { 'duration': duration, 'status': 'error', 'message': str(payload) }
+        if job.get("profile"):
+            stats['profile'] = job["profile"]
 
-        except Exception as e:
-            duration = round(time.time() - start_time, 2)
-            error_stats = { 'duration': duration, 'status': 'error', 'message': str(e) }
-            log_action(action_name, root_dir, result_dir, ignores, ignore_types, error_stats)
-            self._update_recent_menus()
-            
-            messagebox.showerror("错误", f"执行 '{action_name}' 时出错：\n{e}")
+        log_action(action_name, job["root_dir"], job["result_dir"], job["ignores"], job["ignore_types"], stats)
+        self._update_recent_menus()
+
+        if kind == "done":
+            job["on_success"](stats, other_results)
+        elif kind == "cancelled":
+            self.status_var.set(f"⏹ 已取消 '{action_name}'，原有输出文件保持不变")
+        else:
+            messagebox.showerror("错误", f"执行 '{action_name}' 时出错：\n{payload}")
             self.status_var.set(f"❌ 执行 '{action_name}' 失败")
-            return None, []
-        finally:
-            self.progress_bar.stop()
-            self.progress_bar['value'] = 0
-            self._schedule_tip_update(10000)
+        self._schedule_tip_update(10000)
+
+    def _cancel_job(self):
+        if self.job_thread is not None and self.job_thread.is_alive():
+            self.cancel_event.set()
+            self.cancel_btn.config(state="disabled")
+            self.status_var.set("正在取消...")
 
     def _generate_json(self):
-        params = self._get_common_generation_params()
-        if not params or not params[0]: return
-        
-        def action(entries_generator):
-            writer = Writer()
-            result_path = Path(params[1]) / self.content_file
+        result_dir = self.result_dir_var.get().strip()
+
+        def action(entries_generator, manifest, metrics):
+            budget = shard_budget(self.shard_max_bytes, self.shard_max_tokens)
+            writer = make_writer(Writer, self.read_workers, budget, manifest, self._open_blob_cache(), metrics)
+            result_path = Path(result_dir) / self.content_file
             final_stats = None
             for result in writer.updateFile(result_path, entries_generator):
                 if isinstance(result, (int, float)):
                     yield result
                 else:
                     final_stats = result
-            yield final_stats, result_path
+            yield final_stats, output_path_for(result_path, budget)
 
-        stats, results = self._execute_and_log("generate_json", action, is_generator=True)
-        if stats and stats.get('status') == 'success':
+        def on_success(stats, results):
             result_path = results[0]
             self.status_var.set(f"✅ JSON 已生成: {result_path} (耗时: {stats['duration']}s)")
             messagebox.showinfo("成功", f"JSON 文件生成成功！\n{result_path}")
 
+        self._execute_and_log("generate_json", action, on_success)
+
     def _generate_xml(self):
-        params = self._get_common_generation_params()
-        if not params or not params[0]: return
+        result_dir = self.result_dir_var.get().strip()
 
-        def action(entries_generator):
-            writer = XmlWriter()
-            result_path = Path(params[1]) / self.xml_file
+        def action(entries_generator, manifest, metrics):
+            budget = shard_budget(self.shard_max_bytes, self.shard_max_tokens)
+            writer = make_writer(XmlWriter, self.read_workers, budget, manifest, self._open_blob_cache(), metrics)
+            result_path = Path(result_dir) / self.xml_file
             final_stats = None
             for result in writer.updateFile(result_path, entries_generator):
                 if isinstance(result, (int, float)):
                     yield result
                 else:
                     final_stats = result
-            yield final_stats, result_path
+            yield final_stats, output_path_for(result_path, budget)
 
-        stats, results = self._execute_and_log("generate_xml", action, is_generator=True)
-        if stats and stats.get('status') == 'success':
+        def on_success(stats, results):
             result_path = results[0]
             self.status_var.set(f"✅ XML 已生成: {result_path} (耗时: {stats['duration']}s)")
             messagebox.showinfo("成功", f"XML 文件生成成功！\n{result_path}")
 
+        self._execute_and_log("generate_xml", action, on_success)
+
     def _generate_tree(self):
-        params = self._get_common_generation_params()
-        if not params or not params[0]: return
+        result_dir = self.result_dir_var.get().strip()
 
-        def action(entries_generator):
-            builder = TreeBuilder()
-            result_path = Path(params[1]) / self.tree_file
+        def action(entries_generator, manifest, metrics):
+            builder = TreeBuilder(metrics=metrics)
+            result_path = Path(result_dir) / self.tree_file
             final_stats, content = None, None
             for result in builder.buildTree(result_path, entries_generator):
                 if isinstance(result, (int, float)):
@@ -440,14 +692,105 @@ class ProjectStructureApp:
                     final_stats, content = result
             yield final_stats, content
 
-        stats, results = self._execute_and_log("generate_tree", action, is_generator=True)
-        if stats and stats.get('status') == 'success':
+        def on_success(stats, results):
             content = results[0]
             self.status_var.set(f"✅ 目录树已生成 (耗时: {stats['duration']}s)")
             self._show_tree_window(content)
 
+        self._execute_and_log("generate_tree", action, on_success)
+
+    def _generate_archive(self):
+        result_dir = self.result_dir_var.get().strip()
+
+        def action(entries_generator, manifest, metrics):
+            writer = ArchiveWriter(self.read_workers, self.archive_codec, manifest=manifest, blob_cache=self._open_blob_cache(),
+                                   metrics=metrics)
+            result_path = Path(result_dir) / self.archive_file
+            final_stats = None
+            for result in writer.updateFile(result_path, entries_generator):
+                if isinstance(result, (int, float)):
+                    yield result
+                else:
+                    final_stats = result
+            yield final_stats, result_path
+
+        def on_success(stats, results):
+            result_path = results[0]
+            self.status_var.set(f"✅ 归档已生成: {result_path} (耗时: {stats['duration']}s)")
+            messagebox.showinfo("成功", f"归档文件生成成功！\n{result_path}")
+
+        self._execute_and_log("generate_archive", action, on_success)
+
+    def _generate_all(self, changed_paths=None):
+        """changed_paths 不为 None 时由监视模式触发: 只更新状态栏，不弹出对话框"""
+        result_dir = self.result_dir_var.get().strip()
+
+        def action(entries_generator, manifest, metrics):
+            # 一次扫描、每个文件只读取一次，同时生成 JSON、XML 和目录树；
+            # 归档每次都要读取全部文件，不放在这里，以免破坏增量生成（由"生成归档"单独生成）
+            yield from generate_all(entries_generator, result_dir, self.content_file, self.xml_file, self.tree_file,
+                                    read_workers=self.read_workers, manifest=manifest, blob_cache=self._open_blob_cache(),
+                                    shard_budget=shard_budget(self.shard_max_bytes, self.shard_max_tokens),
+                                    metrics=metrics)
+
+        def on_success(stats, results):
+            outputs, content = results
+            if changed_paths is not None:
+                self.status_var.set(f"🔄 检测到 {len(changed_paths)} 处变化，已自动更新全部输出 (耗时: {stats['duration']}s)")
+                return
+            self.status_var.set(f"✅ JSON/XML/目录树已生成 (耗时: {stats['duration']}s)")
+            messagebox.showinfo("成功", "全部文件生成成功！\n" + "\n".join(str(path) for path in outputs.values()))
+            self._show_tree_window(content)
+
+        self._execute_and_log("generate_all", action, on_success)
+
+    def _toggle_watch(self):
+        if not self.watch_var.get():
+            self._stop_watch()
+            self.status_var.set("已停止监视")
+            return
+
+        root_dir, result_dir, ignores, ignore_types = self._get_common_generation_params()
+        if not root_dir or not os.path.isdir(root_dir):
+            self.watch_var.set(False)
+            return
+
+        # 每次轮询都要扫描一遍，单进程即可；并行扫描只在重新生成时使用
+        make_extractor = partial(Extractor, root_dir, ignores, ignore_types, detect_binary=False,
+                                 use_gitignore=self.use_gitignore, scan_workers=1, keep_stat=True)
+        exclude = output_excludes(root_dir, result_dir, [self.content_file, self.xml_file, self.tree_file, self.archive_file])
+        watcher = ProjectWatcher(make_extractor, self.watch_queue.put, self.watch_debounce, exclude)
+        self.watch_stop = threading.Event()
+        self.watch_pending = set()
+        threading.Thread(target=watch, args=([watcher], self.watch_stop, self.watch_interval), daemon=True).start()
+        self.status_var.set(f"👀 正在监视 {root_dir}，文件变化后将自动更新全部输出")
+        self.root.after(WATCH_POLL_MS, self._poll_watch_queue, self.watch_stop)
+
+    def _stop_watch(self):
+        if self.watch_stop is not None:
+            self.watch_stop.set()
+            self.watch_stop = None
+
+    def _poll_watch_queue(self, stop_event):
+        if stop_event.is_set():
+            return
+        try:
+            while True:
+                self.watch_pending.update(self.watch_queue.get_nowait())
+        except queue.Empty:
+            pass
+        # 有任务正在运行时先积攒，等任务结束后再合并为一次更新
+        if self.watch_pending and (self.job_thread is None or not self.job_thread.is_alive()):
+            changed_paths, self.watch_pending = sorted(self.watch_pending), set()
+            self._generate_all(changed_paths)
+        self.root.after(WATCH_POLL_MS, self._poll_watch_queue, stop_event)
+
     def _restore_project(self):
-        source_file = filedialog.askopenfilename(title="选择要还原的 JSON 或 XML 文件", filetypes=[("Project Files", "*.json *.xml"), ("All files", "*.*")])
+        # 还原在界面线程中进行；与后台生成任务同时运行会争用磁盘，开启性能分析时两者的报告也会互相干扰
+        if self.job_thread is not None and self.job_thread.is_alive():
+            messagebox.showwarning("提示", "已有任务正在运行，请等待完成或先取消。")
+            return
+        source_file = filedialog.askopenfilename(title="选择要还原的 JSON、XML 或归档文件", filetypes=[("Project Files", "*.json *.xml *.psa"), ("All files", "*.*")])
         if not source_file: return
         target_root = filedialog.askdirectory(title="选择要将项目还原到的目录")
         if not target_root: return
@@ -457,15 +800,21 @@ class ProjectStructureApp:
         self.root.update_idletasks()
         
         start_time = time.time()
+        profiler = RunProfiler("restore_project") if self.profiling else None
         try:
-            restorer = ProjectRestorer(source_file, target_root)
-            success, message, stats = restorer.restore()
+            restorer = ProjectRestorer(source_file, target_root, self.read_workers)
+            if profiler is None:
+                success, message, stats = restorer.restore()
+            else:
+                success, message, stats = profiler.run(restorer.restore)
             if not success:
                 raise Exception(message)
 
             duration = round(time.time() - start_time, 2)
             stats['duration'] = duration
             stats['status'] = 'success'
+            if profiler is not None:
+                stats['profile'] = profiler.report
             
             log_action("restore_project", "N/A", target_root, [], [], stats)
             self._update_recent_menus()
@@ -476,6 +825,8 @@ class ProjectStructureApp:
         except Exception as e:
             duration = round(time.time() - start_time, 2)
             error_stats = { 'duration': duration, 'status': 'error', 'message': str(e) }
+            if profiler is not None and profiler.report is not None:
+                error_stats['profile'] = profiler.report
             log_action("restore_project", "N/A", target_root, [], [], error_stats)
             self._update_recent_menus()
             messagebox.showerror("错误", f"执行 'restore_project' 时出错：\n{e}")
@@ -521,5 +872,8 @@ class ProjectStructureApp:
                 messagebox.showerror("错误", f"重置设置时出错：\n{e}")
 
     def _on_close(self):
+        self.cancel_event.set()
+        self._cancel_background_count()
+        self._stop_watch()
         self._save_settings()
         self.root.destroy()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 与 __main__.py 相同，以仓库根目录为导入起点 (utils.*, cli.* ...)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,61 @@
+import pytest
+
+from utils.JsonWriter import Writer
+from utils.Pipeline import MultiSinkPipeline
+from utils.ProjectStructureExtract import Extractor
+from utils.ProjectStructureTree import TreeBuilder
+from utils.ShardedExport import make_writer
+from utils.XmlWriter import XmlWriter
+
+class FailingSink:
+    """begin / addEntry 正常，finish() 时出错"""
+    def __init__(self):
+        self.aborted = False
+
+    def begin(self, filename):
+        pass
+
+    def needsContent(self, entry):
+        return True
+
+    def addEntry(self, entry, content):
+        pass
+
+    def finish(self):
+        raise OSError("磁盘已满")
+
+    def abort(self):
+        self.aborted = True
+
+def _project(root):
+    for number in range(30):
+        path = root / f"pkg{number % 3}" / f"mod{number}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"print({number})\n" * 20, encoding="utf-8")
+
+def test_failing_finish_aborts_remaining_sinks(tmp_path):
+    root = tmp_path / "project"
+    out = tmp_path / "out"
+    _project(root)
+    extractor = Extractor(str(root), detect_binary=False)
+    extractor.count_items()
+
+    failing = FailingSink()
+    pipeline = MultiSinkPipeline(read_workers=2)
+    pipeline.add(make_writer(Writer, 2, 0), out / "project_content.json")
+    pipeline.add(failing, out / "failing")
+    # 分片导出先写到临时目录，未 finish 的 XML 分片和目录树都应被清理
+    pipeline.add(make_writer(XmlWriter, 2, 512), out / "project_content.xml")
+    pipeline.add(TreeBuilder(), out / "project_tree.md")
+
+    with pytest.raises(OSError, match="磁盘已满"):
+        for _ in pipeline.run(extractor.extract_project_structure()):
+            pass
+
+    assert failing.aborted
+    leftovers = sorted(path.name for path in out.iterdir())
+    assert not [name for name in leftovers if name.endswith(".tmp")]
+    # 在出错之前完成的 JSON 保持提交，之后的输出都没有生成
+    assert "project_content.json" in leftovers
+    assert "project_tree.md" not in leftovers
+    assert not [name for name in leftovers if ".part" in name or name.endswith(".shards.json")]
@@ -0,0 +1,85 @@
+import os
+from functools import partial
+
+from utils.HistoryLogger import BASE_PATH, LOG_DIR
+from utils.ProjectStructureExtract import Extractor
+from utils.ProjectWatcher import ProjectWatcher, output_excludes
+from utils.RunProfiler import PROFILE_DIR
+
+OUTPUT_NAMES = ["project_content.json", "project_content.xml", "project_tree.md", "project_content.psa"]
+IGNORE_DIRS = [".git", "__pycache__", ".pytest_cache"]
+
+def _watcher(root, result_dir, changes):
+    make_extractor = partial(Extractor, str(root), IGNORE_DIRS, [], detect_binary=False, keep_stat=True)
+    exclude = output_excludes(root, result_dir, OUTPUT_NAMES)
+    return ProjectWatcher(make_extractor, changes.append, debounce=0, exclude=exclude)
+
+def _write(path, text="x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+def test_app_log_dir_inside_watched_root_does_not_retrigger(tmp_path):
+    # 在包含程序自身 log/ 目录的根目录上监视: 生成时写入的历史记录和性能分析报告不能算作项目变化
+    assert LOG_DIR.parent == BASE_PATH
+    created = [path for path in (LOG_DIR, PROFILE_DIR) if not path.exists()]
+    written = [LOG_DIR / f"watch-test-{os.getpid()}.jsonl", PROFILE_DIR / f"watch-test-{os.getpid()}.txt"]
+    changes = []
+    watcher = _watcher(BASE_PATH, tmp_path, changes)
+    try:
+        for path in (LOG_DIR, PROFILE_DIR):
+            path.mkdir(parents=True, exist_ok=True)
+        watcher.start()
+        for path in written:
+            _write(path, "{}\n")
+        assert watcher.poll() == set()
+        assert watcher.step() is None and changes == []
+    finally:
+        for path in written:
+            path.unlink(missing_ok=True)
+        for path in reversed(created):
+            try:
+                path.rmdir()
+            except OSError:
+                pass
+
+def test_only_exact_output_names_are_skipped(tmp_path):
+    _write(tmp_path / "src" / "main.py")
+    changes = []
+    watcher = _watcher(tmp_path, tmp_path, changes)
+    watcher.start()
+
+    generated = ["project_content.json", "project_content.json.idx", "project_content.part001.xml",
+                 "project_content.part001.xml.idx", "project_content.xml.shards.json", "project_tree.md",
+                 "project_content.psa", ".project_manifest.json", ".project_content.json.k2x9.tmp",
+                 ".project_content.json.shards.tmp/project_content.part001.json"]
+    for name in generated:
+        _write(tmp_path / name)
+    assert watcher.poll() == set()
+
+    _write(tmp_path / "project_content_notes.md")
+    _write(tmp_path / "project_tree.md.bak")
+    # 第一次轮询记下变化，变化稳定后 (debounce=0) 的下一次轮询才回调
+    assert watcher.step() is None and changes == []
+    watcher.step()
+    assert changes == [["project_content_notes.md", "project_tree.md.bak"]]
+
+def test_result_dir_inside_root_is_skipped(tmp_path):
+    changes = []
+    watcher = _watcher(tmp_path, tmp_path / "outputs", changes)
+    watcher.start()
+    _write(tmp_path / "outputs" / "anything.txt")
+    assert watcher.poll() == set()
+
+def test_each_file_is_stat_once_per_poll(tmp_path, monkeypatch):
+    for number in range(5):
+        _write(tmp_path / "src" / f"mod{number}.py")
+    watcher = _watcher(tmp_path, tmp_path / "outputs", [])
+    watcher.start()
+    calls = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda path, *args, **kwargs: calls.append(path) or real_stat(path, *args, **kwargs))
+    _write(tmp_path / "src" / "mod0.py", "changed")
+    assert watcher.poll() == {"src/mod0.py".replace("/", os.sep)}
+    assert watcher.step() is None
+    # 只通过扫描时的 DirEntry 取得文件信息，不再逐个调用 os.stat
+    assert not [path for path in calls if str(path).endswith(".py")]
@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from pathlib import Path
+import os
+import tempfile
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+TEMP_SUFFIX = ".tmp"
+
+# mkstemp 创建的文件权限为 0600，提交前改为与普通 open() 相同的权限（按当前 umask）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def encode_text(text):
+    """按文本模式写入的规则编码（utf-8，换行符转换为 os.linesep），供二进制模式下自行统计字节偏移"""
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    return text.encode('utf-8')
+
+class AtomicFile:
+    """
+    先写入同目录下的临时文件 .<目标文件名>.<随机串>.tmp（与目标位于同一目录，保证 os.replace 是原子操作；
+    名称唯一，界面与命令行同时写入同一目标时不会共用临时文件），
+    commit() 时写回磁盘 (fsync) 并原子地重命名为目标文件，崩溃时目标文件要么是旧内容、要么是完整的新内容；
+    discard() 删除临时文件，目标文件保持原样。
+    """
+    def __init__(self, path, mode='w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=TEMP_SUFFIX, prefix=f".{self.path.name}.", dir=self.path.parent)
+        self.tmp_path = Path(tmp_path)
+        if 'b' in mode:
+            encoding = None
+        try:
+            self.file = open(fd, mode, encoding=encoding, buffering=buffering)
+        except BaseException:
+            os.close(fd)
+            self._remove_tmp()
+            raise
+
+    def _remove_tmp(self):
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+    def commit(self):
+        try:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            os.chmod(self.tmp_path, 0o666 & ~_UMASK)
+            os.replace(self.tmp_path, self.path)
+        except BaseException:
+            self.file.close()
+            self._remove_tmp()
+            raise
+
+    def discard(self):
+        self.file.close()
+        self._remove_tmp()
+
+@contextmanager
+def atomic_open(path, mode='w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE):
+    """
+    AtomicFile 的上下文管理器形式: 正常退出时提交，
+    写入过程中出错（或生成器被中途关闭）时丢弃临时文件。
+    """
+    atomic = AtomicFile(path, mode, encoding, buffering)
+    try:
+        yield atomic.file
+    except BaseException:
+        atomic.discard()
+        raise
+    atomic.commit()
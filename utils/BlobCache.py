@@ -0,0 +1,129 @@
+from pathlib import Path
+import os
+import sys
+import threading
+
+def _user_cache_dir():
+    """当前用户的缓存目录: 程序所在目录可能不可写（如安装在 Program Files 中或打包为只读的可执行程序）"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "ProjectStructureExtractor"
+
+CACHE_DIR = _user_cache_dir() / "blobs"
+DEFAULT_CAPACITY_MB = 512
+
+# 每个缓存目录在进程内只用一个实例，保存的总大小在各次生成之间沿用，不必每次都重新统计整个目录
+_shared = {}
+_shared_lock = threading.Lock()
+
+def shared_blob_cache(capacity_mb=DEFAULT_CAPACITY_MB, cache_dir=CACHE_DIR):
+    """返回该缓存目录在本进程中共用的 BlobCache，上限按最近一次的设置更新"""
+    key = os.path.abspath(cache_dir)
+    with _shared_lock:
+        cache = _shared.get(key)
+        if cache is None:
+            cache = _shared[key] = BlobCache(cache_dir, capacity_mb)
+        else:
+            cache.capacity = int(capacity_mb * 1024 * 1024)
+        return cache
+
+class BlobCache:
+    """
+    磁盘上的内容寻址缓存: 以原始文件内容的哈希为键，保存解码后的文本。
+    Writer、XmlWriter 以及之后的导出器共用同一份缓存，命中时无需再读取和解码源文件。
+    命中时更新 mtime 作为最近使用时间，总大小超过上限时按 LRU 淘汰。
+    写入失败（如目录不可写、磁盘已满）后不再写入，只提示一次。
+    缓存的是项目文件的完整内容，因此默认关闭 (BLOB_CACHE_MB=0)，由用户显式开启。
+    """
+    def __init__(self, cache_dir=CACHE_DIR, capacity_mb=DEFAULT_CAPACITY_MB):
+        self.cache_dir = Path(cache_dir)
+        self.capacity = int(capacity_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._write_failed = False
+        self._lock = threading.Lock()
+
+    def _blob_path(self, digest):
+        return self.cache_dir / digest[:2] / digest
+
+    def get(self, digest):
+        """返回缓存的文本，未命中返回 None"""
+        path = self._blob_path(digest)
+        try:
+            with open(path, 'rb') as f:
+                text = f.read().decode('utf-8')
+            os.utime(path)
+        except (OSError, UnicodeDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, digest, text):
+        if self._write_failed:
+            return
+        path = self._blob_path(digest)
+        if path.exists():
+            return
+        data = text.encode('utf-8')
+        tmp_path = path.with_name(f"{digest}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            with self._lock:
+                first_failure = not self._write_failed
+                self._write_failed = True
+            if first_failure:
+                print(f"写入内容缓存失败，之后不再写入 {self.cache_dir}: {e}")
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+
+    def _scan(self):
+        """返回 [(mtime, size, path), ...] 并刷新当前总大小"""
+        blobs = []
+        if self.cache_dir.exists():
+            for bucket in os.scandir(self.cache_dir):
+                if not bucket.is_dir():
+                    continue
+                for blob in os.scandir(bucket.path):
+                    try:
+                        st = blob.stat()
+                    except OSError:
+                        continue
+                    blobs.append((st.st_mtime_ns, st.st_size, blob.path))
+        self._size = sum(size for _, size, _ in blobs)
+        return blobs
+
+    def trim(self):
+        """总大小超过上限时，从最久未使用的条目开始删除，直到降到上限的 90% 以下"""
+        with self._lock:
+            if self._size is not None and self._size <= self.capacity:
+                return
+            blobs = self._scan()
+            if self._size <= self.capacity:
+                return
+            target = self.capacity * 0.9
+            for _, size, path in sorted(blobs):
+                if self._size <= target:
+                    break
+                try:
+                    os.remove(path)
+                    self._size -= size
+                except OSError:
+                    continue
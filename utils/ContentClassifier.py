@@ -0,0 +1,32 @@
+SNIFF_SIZE = 2048
+
+# 已知的文本扩展名: 不必在遍历阶段单独打开文件嗅探，读取阶段仍会检查读到的头部
+TEXT_EXTENSIONS = frozenset({
+    ".py", ".pyi", ".pyx", ".ipynb", ".txt", ".md", ".rst", ".json", ".jsonl", ".yaml", ".yml",
+    ".toml", ".ini", ".cfg", ".conf", ".env", ".xml", ".html", ".htm", ".css", ".scss", ".less",
+    ".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".vue", ".svelte", ".c", ".h", ".cc", ".cpp",
+    ".cxx", ".hpp", ".hh", ".cs", ".java", ".kt", ".kts", ".scala", ".go", ".rs", ".swift",
+    ".m", ".mm", ".rb", ".php", ".pl", ".lua", ".r", ".sql", ".sh", ".bash", ".zsh", ".ps1",
+    ".bat", ".cmd", ".gradle", ".properties", ".csv", ".tsv", ".tex", ".gitignore", ".dockerfile",
+})
+
+# 已知的二进制扩展名: 这些格式的文件头部几乎必然含有 NUL 字节，直接判定为二进制，完全不打开文件
+BINARY_EXTENSIONS = frozenset({
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".icns", ".webp", ".tif", ".tiff",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".jar", ".war", ".whl",
+    ".exe", ".dll", ".so", ".dylib", ".a", ".o", ".obj", ".lib", ".pdb", ".class", ".pyc", ".pyd",
+    ".mp3", ".mp4", ".mov", ".avi", ".mkv", ".wav", ".flac", ".ogg",
+    ".ttf", ".otf", ".woff", ".woff2", ".sqlite", ".sqlite3", ".db",
+})
+
+def classify_extension(ext):
+    """按扩展名快速判定: 二进制返回 True，文本返回 False，无法判定时返回 None"""
+    if ext in BINARY_EXTENSIONS:
+        return True
+    if ext in TEXT_EXTENSIONS:
+        return False
+    return None
+
+def looks_binary(head):
+    """与 is_binary 相同的判定规则: 文件前 2KB 中含有 NUL 字节即视为二进制"""
+    return b'\x00' in head[:SNIFF_SIZE]
@@ -0,0 +1,140 @@
+from utils.ProjectStructureExtract import EntryType
+from utils.ContentClassifier import SNIFF_SIZE, looks_binary
+from collections import deque
+from time import perf_counter
+import hashlib
+import os
+
+BINARY_PLACEHOLDER = "Binary File CANNOT Be Read"
+DEFAULT_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+
+def decode_bytes(data):
+    """
+    按 utf-8 -> gbk -> utf-8(忽略错误) 的顺序解码，并与文本模式一样统一换行符。
+    返回 (text, encoding)，encoding 为 'utf-8'、'gbk' 或 'utf-8-ignore'。
+    """
+    try:
+        text, encoding = data.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        try:
+            text, encoding = data.decode('gbk'), 'gbk'
+        except UnicodeDecodeError:
+            text, encoding = data.decode('utf-8', errors='ignore'), 'utf-8-ignore'
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text, encoding
+
+def decode_content(data):
+    return decode_bytes(data)[0]
+
+def _is_hidden(rel_path):
+    """以 . 开头的文件或位于以 . 开头的目录中（如 .env、.aws/credentials）: 可能含有密钥，不写入内容缓存"""
+    return any(part.startswith('.') for part in rel_path.split(os.sep))
+
+def read_entry_content(entry, blob_cache=None, metrics=None):
+    """
+    读取单个条目的文本内容。每个文件只打开一次: 先读取头部嗅探是否为二进制，
+    是文本再从同一个句柄读完剩余内容，并就地把 entry.type 修正为 FILE 或 BINARY_FILE。目录返回 None。
+    提供 blob_cache 时，清单中已知内容哈希的文件直接从缓存取出解码后的文本；隐藏文件不写入缓存。
+    提供 metrics (StageMetrics) 时记录读取、解码、哈希各阶段的耗时和字节数。
+    """
+    if entry.type == EntryType.DIRECTORY:
+        return None
+    if entry.type == EntryType.BINARY_FILE:
+        return BINARY_PLACEHOLDER
+    record = entry.record
+    if blob_cache is not None and record is not None and record.digest is not None:
+        text = blob_cache.get(record.digest)
+        if text is not None:
+            entry.type = EntryType.FILE
+            entry.encoding, entry.digest = record.encoding, record.digest
+            if metrics is not None:
+                metrics.count("blob_cache_hits")
+            return text
+    start = perf_counter() if metrics is not None else 0
+    try:
+        with open(entry.path, 'rb') as f:
+            head = f.read(SNIFF_SIZE)
+            if looks_binary(head):
+                entry.type = EntryType.BINARY_FILE
+                if metrics is not None:
+                    metrics.add("sniff", perf_counter() - start, bytes_read=len(head))
+                return BINARY_PLACEHOLDER
+            data = head + f.read()
+    except Exception as e:
+        # 与 is_binary 一致: 尚未判定的文件无法打开时按二进制处理
+        if entry.type == EntryType.PENDING_FILE:
+            entry.type = EntryType.BINARY_FILE
+            return BINARY_PLACEHOLDER
+        return f"Error reading file: {e}"
+    entry.type = EntryType.FILE
+    if metrics is not None:
+        read_done = perf_counter()
+        metrics.add("read", read_done - start, bytes_read=len(data))
+    text, entry.encoding = decode_bytes(data)
+    if metrics is not None:
+        decode_done = perf_counter()
+        metrics.add("decode", decode_done - read_done, **{"decode_" + entry.encoding: 1})
+    if entry.stat is not None:
+        entry.digest = hashlib.sha1(data).hexdigest()
+        if blob_cache is not None and not _is_hidden(entry.rel_path):
+            blob_cache.put(entry.digest, text)
+        if metrics is not None:
+            metrics.add("hash", perf_counter() - decode_done)
+    if metrics is not None:
+        metrics.file_time(entry.rel_path, perf_counter() - start)
+    return text
+
+class ContentReader:
+    """
+    位于 Extractor 与各 Writer 之间的读取阶段: 用线程池并发预读、嗅探并解码文件，
+    但仍严格按照条目生成器的原始顺序输出，保证结果与串行读取逐字节一致。
+    """
+    def __init__(self, workers=DEFAULT_WORKERS, prefetch=None, blob_cache=None, metrics=None):
+        self.workers = max(1, int(workers or 1))
+        self.prefetch = prefetch or self.workers * 4
+        self.blob_cache = blob_cache
+        self.metrics = metrics
+
+    def _read(self, entry):
+        return read_entry_content(entry, self.blob_cache, self.metrics)
+
+    def _trim_cache(self):
+        if self.blob_cache is not None:
+            self.blob_cache.trim()
+
+    def iter_contents(self, entries_generator, skip=None):
+        """
+        包装条目生成器，按原顺序yield (entry, progress, content)。
+        skip(entry) 为真的条目不读取，content 为 None（例如可直接复用上次输出片段的文件）。
+        """
+        if self.workers <= 1:
+            try:
+                for entry, progress in entries_generator:
+                    if skip is not None and skip(entry):
+                        yield entry, progress, None
+                    else:
+                        yield entry, progress, self._read(entry)
+            finally:
+                self._trim_cache()
+            return
+
+        # 延迟导入: concurrent.futures 会连带加载 logging，串行模式和命令行冷启动用不到
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        window = deque()
+        try:
+            for entry, progress in entries_generator:
+                future = None
+                if entry.type != EntryType.DIRECTORY and not (skip is not None and skip(entry)):
+                    future = pool.submit(self._read, entry)
+                window.append((entry, progress, future))
+                if len(window) >= self.prefetch:
+                    entry, progress, future = window.popleft()
+                    yield entry, progress, future.result() if future else None
+            while window:
+                entry, progress, future = window.popleft()
+                yield entry, progress, future.result() if future else None
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            self._trim_cache()
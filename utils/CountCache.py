@@ -0,0 +1,58 @@
+"""
+界面后台计数的结果缓存: 以 (根目录, 忽略的目录, 忽略的文件类型, 是否遵循 .gitignore) 为键，
+同时保存扫描所依赖的各目录（及 .gitignore）在扫描时的修改时间。
+
+在目录下增删文件或子目录会改变该目录的修改时间，因此只要这些修改时间都未变化，缓存的条目数就仍然有效；
+验证只需对每个目录调用一次 os.stat，不必列出目录内容，切换回最近用过的根目录时几乎立刻得到结果。
+"""
+from collections import OrderedDict
+import os
+import threading
+
+COUNT_CACHE_SIZE = 16
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+class CountCache:
+    def __init__(self, capacity=COUNT_CACHE_SIZE):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # 键 -> (条目数, ((路径, 修改时间), ...))，按最近使用排列
+
+    @staticmethod
+    def key(root_dir, ignore_dirs, ignore_file_types, use_gitignore):
+        return (os.path.abspath(root_dir), frozenset(ignore_dirs), frozenset(ft.lower() for ft in ignore_file_types),
+                bool(use_gitignore))
+
+    def lookup(self, key):
+        """返回仍然有效的缓存条目数；没有缓存或任一路径的修改时间已变化时返回 None"""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+        if cached is None:
+            return None
+        count, mtimes = cached
+        # 在锁外验证: 大项目中可能有上万个目录
+        for path, mtime in mtimes:
+            if _mtime(path) != mtime:
+                with self._lock:
+                    if self._entries.get(key) is cached:
+                        del self._entries[key]
+                return None
+        return count
+
+    def store(self, key, count, mtimes):
+        """
+        mtimes 为扫描过程中记录的 [(路径, 修改时间), ...] (Extractor.validation_mtimes())。
+        不能在扫描结束后再取修改时间: 扫描期间发生的修改会被当作已包含在结果中。
+        """
+        with self._lock:
+            self._entries[key] = (count, tuple(mtimes))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
@@ -0,0 +1,136 @@
+"""
+JSON / XML 导出文件的随机访问索引。
+
+流式生成时在导出文件旁写入 <导出文件>.idx，记录每个条目片段的字节偏移和长度，以及导出文件的大小和修改时间。
+open_export(path).read(rel_path) 用 mmap 映射导出文件，只解码所请求的那个条目，不必解析整个文档。
+索引缺失或与导出文件不一致时退回流式扫描 (ProjectRestorer)，结果相同但更慢。
+"""
+from utils.AtomicFile import atomic_open
+from pathlib import Path
+import json
+import mmap
+import os
+import xml.etree.ElementTree as ET
+
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+
+def index_path_for(export_path):
+    export_path = Path(export_path)
+    return export_path.with_name(export_path.name + INDEX_SUFFIX)
+
+def write_index(export_path, export_format, entries):
+    """在导出文件（已提交）旁写入索引；entries 为 [[路径, 偏移, 长度], ...]，路径与导出文件中的写法一致"""
+    st = os.stat(export_path)
+    data = {
+        "version": INDEX_VERSION,
+        "format": export_format,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "entries": entries,
+    }
+    with atomic_open(index_path_for(export_path)) as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+def load_index(export_path):
+    """返回与导出文件一致的索引数据，索引不存在、损坏或已过期时返回 None"""
+    try:
+        with open(index_path_for(export_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        st = os.stat(export_path)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != INDEX_VERSION or (data.get("size"), data.get("mtime_ns")) != (st.st_size, st.st_mtime_ns):
+        return None
+    return data
+
+def _decode_json_fragment(data):
+    # 片段形如 "path": "content"
+    return next(iter(json.loads("{" + data.decode('utf-8') + "}").values()))
+
+def _decode_xml_fragment(data):
+    content_element = ET.fromstring(data).find('content')
+    # 空的 CDATA 解析后 text 为 None
+    return (content_element.text or "") if content_element is not None else ""
+
+class ExportReader:
+    """
+    按相对路径读取单个文件内容的只读视图。有有效索引时通过 mmap 按偏移读取；
+    否则首次访问时流式扫描一遍导出文件。用完后请调用 close()（或使用 with 语句）。
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.format = self.path.suffix.lower().lstrip('.')
+        if self.format not in ("json", "xml"):
+            raise ValueError(f"不支持的文件类型: {self.path.suffix}")
+        self._decode = _decode_json_fragment if self.format == "json" else _decode_xml_fragment
+        self._file = None
+        self._map = None
+        self._entries = None
+        self._contents = None
+
+        data = load_index(self.path)
+        self.indexed = data is not None and data.get("format") == self.format
+        if self.indexed:
+            self._entries = {rel_path: (offset, length) for rel_path, offset, length in data["entries"]}
+            self._order = [item[0] for item in data["entries"]]
+            self._file = open(self.path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _scan(self):
+        """没有可用索引时的退路: 流式扫描一遍导出文件并缓存全部内容"""
+        if self._contents is None:
+            from utils.ProjectRestorer import ProjectRestorer
+            self._contents = dict(ProjectRestorer(self.path, ".").iter_file_contents())
+            self._order = list(self._contents)
+        return self._contents
+
+    def _key(self, rel_path, keys):
+        if rel_path in keys:
+            return rel_path
+        # XML 中的路径统一使用 '/'
+        posix_path = rel_path.replace('\\', '/')
+        if posix_path in keys:
+            return posix_path
+        raise KeyError(rel_path)
+
+    def names(self):
+        if not self.indexed:
+            self._scan()
+        return list(self._order)
+
+    def __contains__(self, rel_path):
+        try:
+            self._key(rel_path, self._entries if self.indexed else self._scan())
+            return True
+        except KeyError:
+            return False
+
+    def read(self, rel_path):
+        """返回单个文件的文本内容，不存在时抛出 KeyError"""
+        if not self.indexed:
+            contents = self._scan()
+            return contents[self._key(rel_path, contents)]
+        offset, length = self._entries[self._key(rel_path, self._entries)]
+        return self._decode(self._map[offset:offset + length])
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_export(path):
+    """打开 JSON / XML 导出文件或 .psa 归档，返回支持 names() / read(rel_path) / close() 的读取器"""
+    if Path(path).suffix.lower() == ".psa":
+        from utils.ProjectArchive import ArchiveReader
+        return ArchiveReader(path)
+    return ExportReader(path)
@@ -0,0 +1,145 @@
+"""
+.gitignore 规则解析与匹配，供 Extractor 在遍历时剪枝。
+
+支持的语义与 git 一致: 注释与转义、! 取反、末尾 / 只匹配目录、
+含 / 的模式相对 .gitignore 所在目录锚定、不含 / 的模式匹配任意层级的名称、
+**/ 前缀、/** 后缀和 /**/ 中缀、* ? [...] 通配符，以及嵌套 .gitignore 中更深层规则优先。
+
+同一个 .gitignore 中的全部模式被编译为一个正则（按倒序拼接为带命名分组的多选结构，
+第一个命中的分组就是 git 语义下“最后一条匹配的规则”），每个条目只需一次正则匹配。
+"""
+from collections import namedtuple
+import re
+
+GITIGNORE_FILE = ".gitignore"
+
+GitIgnoreRule = namedtuple("GitIgnoreRule", "pattern negated dir_only")
+
+def _translate_class(pattern, i):
+    """翻译从 pattern[i] == '[' 开始的字符类，返回 (正则片段, 下一个位置)；没有闭合的 ] 时返回 None"""
+    j = i + 1
+    parts = ["["]
+    if j < len(pattern) and pattern[j] in "!^":
+        parts.append("^")
+        j += 1
+    # 紧跟在 [ 或 [! 后面的 ] 是普通字符
+    if j < len(pattern) and pattern[j] == "]":
+        parts.append("\\]")
+        j += 1
+    while j < len(pattern) and pattern[j] != "]":
+        char = pattern[j]
+        if char == "\\" and j + 1 < len(pattern):
+            j += 1
+            char = pattern[j]
+        parts.append("\\" + char if char in "\\^[" else char)
+        j += 1
+    if j >= len(pattern):
+        return None
+    parts.append("]")
+    return "".join(parts), j + 1
+
+def translate(pattern):
+    """把一条已去掉 ! 和末尾 / 的 gitignore 模式翻译为匹配相对路径（以 / 分隔）的正则"""
+    anchored = "/" in pattern
+    if pattern.startswith("/"):
+        pattern = pattern[1:]
+
+    parts = [] if anchored else ["(?:.*/)?"]
+    i, n = 0, len(pattern)
+    while i < n:
+        if pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/"):
+            if i + 2 == n:
+                # 末尾的 ** 匹配其下的一切
+                parts.append(".*")
+                break
+            if pattern[i + 2] == "/":
+                # **/ 匹配零或多层目录
+                parts.append("(?:.*/)?")
+                i += 3
+                continue
+        char = pattern[i]
+        if char == "*":
+            while i + 1 < n and pattern[i + 1] == "*":
+                i += 1
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            translated = _translate_class(pattern, i)
+            if translated is not None:
+                parts.append(translated[0])
+                i = translated[1]
+                continue
+            parts.append("\\[")
+        elif char == "\\" and i + 1 < n:
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return "".join(parts)
+
+def parse_line(line):
+    """解析 .gitignore 中的一行，空行和注释返回 None"""
+    line = line.rstrip("\n").rstrip("\r")
+    # 去掉未转义的行尾空格
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+    if not line or line.startswith("#"):
+        return None
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    elif line.startswith("\\#") or line.startswith("\\!"):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    return GitIgnoreRule(line, negated, dir_only)
+
+class GitIgnoreRules:
+    """一个 .gitignore 文件中的全部规则，路径相对于该文件所在目录"""
+    def __init__(self, lines):
+        self.rules = [rule for rule in map(parse_line, lines) if rule is not None]
+        self._dir_regex = self._compile(range(len(self.rules)))
+        self._file_regex = self._compile(i for i, rule in enumerate(self.rules) if not rule.dir_only)
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                return cls(f.readlines())
+        except OSError:
+            return cls([])
+
+    def _compile(self, indexes):
+        # 倒序拼接: 多选结构从左到右尝试，第一个命中的就是文件中最后一条匹配的规则
+        alternatives = [f"(?P<r{i}>{translate(self.rules[i].pattern)})" for i in reversed(list(indexes))]
+        if not alternatives:
+            return None
+        return re.compile("|".join(alternatives), re.DOTALL)
+
+    def match(self, rel_path, is_dir):
+        """rel_path 以 / 分隔。被忽略返回 True，被 ! 重新包含返回 False，没有规则匹配返回 None"""
+        regex = self._dir_regex if is_dir else self._file_regex
+        if regex is None:
+            return None
+        m = regex.fullmatch(rel_path)
+        if m is None:
+            return None
+        return not self.rules[int(m.lastgroup[1:])].negated
+
+    def __bool__(self):
+        return bool(self.rules)
+
+def is_ignored(chain, rel_path, is_dir):
+    """
+    chain 为 [(规则所在目录的相对路径前缀, GitIgnoreRules), ...]，由浅到深排列。
+    更深层的 .gitignore 优先；都没有匹配时不忽略。
+    """
+    for prefix, rules in reversed(chain):
+        result = rules.match(rel_path[len(prefix):] if prefix else rel_path, is_dir)
+        if result is not None:
+            return result
+    return False
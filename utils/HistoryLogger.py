@@ -3,6 +3,7 @@ import os
 import sys
 from datetime import datetime
 from pathlib import Path
+from utils.AtomicFile import atomic_open
 
 def get_base_path():
     """获取应用的基础路径，兼容开发模式和PyInstaller打包后的模式"""
@@ -16,15 +17,50 @@ def get_base_path():
 BASE_PATH = get_base_path()
 LOG_DIR = BASE_PATH / "log"
 HISTORY_FILE = LOG_DIR / "history.jsonl"
+# 最近使用路径的索引，由 log_action 维护，读取时不必扫描历史记录
+RECENTS_FILE = LOG_DIR / "recent_paths.json"
 MAX_RECENTS = 10
+# 历史记录超过该大小时轮转为 history.jsonl.1 ... history.jsonl.N
+HISTORY_MAX_BYTES = 5 * 1024 * 1024
+HISTORY_BACKUPS = 3
+READ_BLOCK_SIZE = 64 * 1024
 
 def _ensure_log_dir():
     """确保日志目录存在"""
     LOG_DIR.mkdir(parents=True, exist_ok=True)
 
+def _backup_path(number):
+    return HISTORY_FILE.with_name(f"{HISTORY_FILE.name}.{number}")
+
+def _rotate_history():
+    """history.jsonl -> .1 -> .2 ...，最旧的一份被丢弃"""
+    for number in range(HISTORY_BACKUPS, 0, -1):
+        source = _backup_path(number - 1) if number > 1 else HISTORY_FILE
+        if source.exists():
+            os.replace(source, _backup_path(number))
+
+def _add_recent(items, path):
+    """把 path 移到最前面，保持不重复并截断到 MAX_RECENTS 个"""
+    if not path:
+        return items
+    return ([path] + [item for item in items if item != path])[:MAX_RECENTS]
+
+def _load_recents():
+    """读取最近使用路径索引，不存在或损坏时返回 None"""
+    try:
+        with open(RECENTS_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return list(data["roots"]), list(data["results"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _save_recents(recent_roots, recent_results):
+    with atomic_open(RECENTS_FILE) as f:
+        json.dump({"roots": recent_roots, "results": recent_results}, f, ensure_ascii=False, indent=2)
+
 def log_action(action_type, root_dir, result_dir, ignore_dirs, ignore_types, stats=None):
     """
-    记录一个操作到历史日志中。
+    记录一个操作到历史日志中，并更新最近使用路径索引。
     """
     _ensure_log_dir()
     
@@ -40,40 +76,84 @@ def log_action(action_type, root_dir, result_dir, ignore_dirs, ignore_types, sta
     
     with open(HISTORY_FILE, "a", encoding="utf-8") as f:
         f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+        size = f.tell()
+    if size > HISTORY_MAX_BYTES:
+        _rotate_history()
 
-def read_recent_paths():
-    """
-    从历史日志中读取并返回最近使用的、不重复的根目录和输出目录。
-    """
-    if not HISTORY_FILE.exists():
-        return [], []
+    # 先取得包含本条之前记录的索引（不存在时从历史记录中重建），再把本条移到最前面
+    recent_roots, recent_results = read_recent_paths(exclude_last=True)
+    try:
+        _save_recents(_add_recent(recent_roots, root_dir), _add_recent(recent_results, result_dir))
+    except OSError as e:
+        print(f"更新最近使用记录时出错: {e}")
+
+def _iter_lines_reversed(path):
+    """从文件末尾开始按块向前读取，逐行yield（不含换行符），只读取到调用方停止为止"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b""
+        while position > 0:
+            size = min(READ_BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + tail).split(b"\n")
+            # 第一段可能是上一块中某一行的后半部分，留到下一轮拼接
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                yield line
+        yield tail
 
+def _scan_recent_paths(skip=0):
+    """从最新的历史记录向前读取，直到凑齐 MAX_RECENTS 个不重复的路径；skip 为跳过的最新记录条数"""
     recent_roots = []
     recent_results = []
-    
+    for path in [HISTORY_FILE] + [_backup_path(number) for number in range(1, HISTORY_BACKUPS + 1)]:
+        if not path.exists():
+            continue
+        for line in _iter_lines_reversed(path):
+            if not line.strip():
+                continue
+            if skip:
+                skip -= 1
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            root_dir = entry.get("root_dir")
+            result_dir = entry.get("result_dir")
+
+            if root_dir and root_dir not in recent_roots and len(recent_roots) < MAX_RECENTS:
+                recent_roots.append(root_dir)
+
+            if result_dir and result_dir not in recent_results and len(recent_results) < MAX_RECENTS:
+                recent_results.append(result_dir)
+
+            if len(recent_roots) >= MAX_RECENTS and len(recent_results) >= MAX_RECENTS:
+                return recent_roots, recent_results
+    return recent_roots, recent_results
+
+def read_recent_paths(exclude_last=False):
+    """
+    返回最近使用的、不重复的根目录和输出目录。
+    优先读取 log_action 维护的索引；索引不存在（如旧版本的日志）时从历史记录末尾向前读取并重建索引。
+    exclude_last 仅供 log_action 使用: 重建时不计入刚刚写入的那一条。
+    """
+    recents = _load_recents()
+    if recents is not None:
+        return recents
+
     try:
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            for line in reversed(lines):
-                if not line.strip():
-                    continue
-                
-                try:
-                    entry = json.loads(line)
-                    root_dir = entry.get("root_dir")
-                    result_dir = entry.get("result_dir")
-
-                    if root_dir and root_dir not in recent_roots and len(recent_roots) < MAX_RECENTS:
-                        recent_roots.append(root_dir)
-                    
-                    if result_dir and result_dir not in recent_results and len(recent_results) < MAX_RECENTS:
-                        recent_results.append(result_dir)
-                    
-                    if len(recent_roots) >= MAX_RECENTS and len(recent_results) >= MAX_RECENTS:
-                        break
-                except json.JSONDecodeError:
-                    continue
+        recent_roots, recent_results = _scan_recent_paths(skip=1 if exclude_last else 0)
     except Exception as e:
         print(f"读取历史记录时出错: {e}")
+        return [], []
 
+    if not exclude_last and (recent_roots or recent_results):
+        try:
+            _ensure_log_dir()
+            _save_recents(recent_roots, recent_results)
+        except OSError:
+            pass
     return recent_roots, recent_results
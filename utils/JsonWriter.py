@@ -1,54 +1,138 @@
 from utils.ProjectStructureExtract import EntryType
+from utils.ContentReader import ContentReader, DEFAULT_WORKERS
+from utils.AtomicFile import AtomicFile, encode_text
+from utils.ScanManifest import FragmentWriter
+from utils.ExportIndex import write_index
+from utils.ShardedExport import remove_shards
 from pathlib import Path
 import json
 import os
 
+def encode_pair(rel_path, content):
+    """把一个条目编码为 json.dumps(..., indent=2) 中对应的 "path": "content" 片段"""
+    return f"{json.dumps(rel_path, ensure_ascii=False)}: {json.dumps(content, ensure_ascii=False)}"
+
 class Writer:
-    def __init__(self):
+    # 为 False 时 finish() 不打印结果信息（例如作为分片写入器使用时）
+    verbose = True
+
+    def __init__(self, read_workers=DEFAULT_WORKERS, stream=True, manifest=None, blob_cache=None, index=True, metrics=None):
         self.contents = {}
+        self.reader = ContentReader(read_workers, blob_cache=blob_cache, metrics=metrics)
+        # 可选的 StageMetrics (utils.StageMetrics)
+        self.metrics = metrics
+        # 流式模式下每个条目直接写入文件，不在 self.contents 中保留全部内容
+        self.stream = stream
+        # 可选的 ScanManifest (仅流式模式): 未变化的文件直接复制上次输出中的片段
+        self.manifest = manifest
+        # 流式模式下在输出旁写入随机访问索引 (<输出文件>.idx)
+        self.index = index
+        self._goal_file = None
+        self._atomic = None
+        self._out = None
+        self._source = None
+        self.file_count = 0
+        self.dir_count = 0
 
     def updateFile(self, filename, entries_generator):
         """
         根据条目生成器处理并生成 JSON 文件，并返回统计信息。
         """
-        file_count = 0
-        dir_count = 0
-        
-        for entry, progress in entries_generator:
-            if entry.type == EntryType.DIRECTORY:
-                dir_count += 1
-                continue
-            
-            file_count += 1
-            content = ""
-            if entry.type == EntryType.BINARY_FILE:
-                content = "Binary File CANNOT Be Read"
-            elif entry.type == EntryType.FILE:
-                path = Path(entry.path)
-                try:
-                    content = path.read_text(encoding='utf-8')
-                except UnicodeDecodeError:
-                    try:
-                        content = path.read_text(encoding='gbk')
-                    except UnicodeDecodeError:
-                        content = path.read_text(encoding='utf-8', errors='ignore')
-                except Exception as e:
-                    content = f"Error reading file: {e}"
+        self.begin(filename)
+        try:
+            for entry, progress, content in self.reader.iter_contents(entries_generator, self._reusable):
+                self.addEntry(entry, content)
+                if entry.type != EntryType.DIRECTORY:
+                    # Yield progress back to the caller
+                    yield progress
+        except BaseException:
+            self.abort()
+            raise
 
-            self.contents[entry.rel_path] = content
-            
-            # Yield progress back to the caller
-            yield progress
-
-        goal_file = Path(filename)
-        goal_file.parent.mkdir(parents=True, exist_ok=True)
-        goal_file.write_text(
-            json.dumps(self.contents, ensure_ascii=False, indent=2),
-            encoding='utf-8'
-        )
-        
-        stats = {"files": file_count, "dirs": dir_count}
-        print(f"JSON 文件已生成：{goal_file.resolve()}，共 {file_count} 个文件。")
-        
         # Final yield with stats
-        yield stats
+        yield self.finish()
+
+    # ===== 输出端接口: 供 updateFile 以及多输出流水线 (utils.Pipeline) 调用 =====
+
+    def begin(self, filename):
+        self._goal_file = Path(filename)
+        self._goal_file.parent.mkdir(parents=True, exist_ok=True)
+        self.file_count = 0
+        self.dir_count = 0
+        if self.stream:
+            if self.manifest is not None:
+                self._source = self.manifest.fragment_source(self._goal_file)
+            self._atomic = AtomicFile(self._goal_file, 'wb')
+            self._out = FragmentWriter(self._atomic.file, self.manifest, self._source, self.metrics)
+            self._out.write('{')
+
+    def needsContent(self, entry):
+        """该条目是否需要读取文件内容（能直接复用上次输出片段时不需要）"""
+        return not (self._source is not None and self._source.has(entry))
+
+    def encodeEntry(self, entry, content):
+        """返回该文件条目在输出中的完整字节片段（分片导出据此估算大小）"""
+        if self.metrics is not None:
+            return self.metrics.timed("serialize", lambda: encode_text(encode_pair(entry.rel_path, content)))
+        return encode_text(encode_pair(entry.rel_path, content))
+
+    def bytesWritten(self):
+        return self._out.offset
+
+    def addEntry(self, entry, content, data=None):
+        if entry.type == EntryType.DIRECTORY:
+            self.dir_count += 1
+            return
+
+        if self.stream:
+            # 输出与 json.dumps(contents, ensure_ascii=False, indent=2) 完全一致
+            self._out.write('\n  ' if self.file_count == 0 else ',\n  ')
+            self._out.write_entry(entry, content, encode_pair, data)
+        else:
+            self.contents[entry.rel_path] = content
+        self.file_count += 1
+
+    def finish(self):
+        goal_file = self._goal_file
+        if self.stream:
+            self._out.write('\n}' if self.file_count else '}')
+            if self.metrics is None:
+                self._atomic.commit()
+            else:
+                self.metrics.timed("write", self._atomic.commit)
+                self.metrics.count("bytes_written", self._out.offset)
+            self._close_source()
+            if self.index:
+                if self.metrics is None:
+                    write_index(goal_file, "json", self._out.entries)
+                else:
+                    self.metrics.timed("index", write_index, goal_file, "json", self._out.entries)
+            if self.manifest is not None:
+                self.manifest.record_output(goal_file, self._out.fragments)
+        else:
+            goal_file.write_text(
+                json.dumps(self.contents, ensure_ascii=False, indent=2),
+                encoding='utf-8'
+            )
+
+        # 之前分片导出留下的分片已经过期
+        remove_shards(goal_file)
+
+        stats = {"files": self.file_count, "dirs": self.dir_count}
+        if self.verbose:
+            print(f"JSON 文件已生成：{goal_file.resolve()}，共 {self.file_count} 个文件。")
+        return stats
+
+    def abort(self):
+        """丢弃写了一半的临时文件，保留原有输出"""
+        if self._atomic is not None:
+            self._atomic.discard()
+        self._close_source()
+
+    def _reusable(self, entry):
+        return not self.needsContent(entry)
+
+    def _close_source(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
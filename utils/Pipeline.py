@@ -0,0 +1,103 @@
+from utils.ProjectStructureExtract import EntryType
+from utils.ContentReader import ContentReader, DEFAULT_WORKERS
+from utils.JsonWriter import Writer
+from utils.XmlWriter import XmlWriter
+from utils.ProjectStructureTree import TreeBuilder
+from utils.ProjectArchive import ArchiveWriter
+from utils.ShardedExport import make_writer, output_path_for
+from pathlib import Path
+
+class MultiSinkPipeline:
+    """
+    多输出流水线: 一次 extract_project_structure() 遍历、每个文件只读取和解码一次，
+    再把同一个条目同时分发给多个输出端 (Writer / XmlWriter / TreeBuilder)。
+    输出端需提供 begin / needsContent / addEntry / finish / abort 接口 (包括 ArchiveWriter)。
+    """
+    def __init__(self, read_workers=DEFAULT_WORKERS, blob_cache=None, metrics=None):
+        self.reader = ContentReader(read_workers, blob_cache=blob_cache, metrics=metrics)
+        self.sinks = []
+
+    def add(self, sink, filename):
+        self.sinks.append((sink, filename))
+        return self
+
+    def _reusable(self, entry):
+        # 所有输出端都能复用上次的片段时才跳过读取
+        return not any(sink.needsContent(entry) for sink, _ in self.sinks)
+
+    def run(self, entries_generator):
+        """
+        生成器: 先yield进度，最后yield各输出端的统计信息列表（与添加顺序一致）。
+        任一输出端出错时，其余尚未完成的输出端都会 abort()，不留下临时文件或分片临时目录，然后重新抛出异常；
+        已经 finish() 的输出端保持已提交的结果。
+        """
+        begun = []
+        try:
+            for sink, filename in self.sinks:
+                sink.begin(filename)
+                begun.append(sink)
+            for entry, progress, content in self.reader.iter_contents(entries_generator, self._reusable):
+                for sink, _ in self.sinks:
+                    sink.addEntry(entry, content)
+                if entry.type != EntryType.DIRECTORY:
+                    yield progress
+        except BaseException:
+            self._abort(begun)
+            raise
+
+        stats = []
+        for index, (sink, _) in enumerate(self.sinks):
+            try:
+                stats.append(sink.finish())
+            except BaseException:
+                # 包括出错的这个: 它可能已经写了一半
+                self._abort([pending for pending, _ in self.sinks[index:]])
+                raise
+        yield stats
+
+    @staticmethod
+    def _abort(sinks):
+        """逐个 abort()，某个输出端 abort 失败也不影响其余的清理"""
+        for sink in sinks:
+            try:
+                sink.abort()
+            except Exception as e:
+                print(f"清理未完成的输出失败: {e}")
+
+def generate_all(entries_generator, result_dir, content_file="project_content.json",
+                 xml_file="project_content.xml", tree_file="project_tree.md",
+                 read_workers=DEFAULT_WORKERS, manifest=None, blob_cache=None,
+                 archive_file=None, archive_codec="zlib", shard_budget=0, metrics=None):
+    """
+    一次扫描同时生成 JSON、XML 和目录树；指定 archive_file 时同时生成压缩归档
+（归档没有可复用的片段，加入后每个文件都要重新读取和解码，增量清单不再能跳过读取），
+    shard_budget 大于 0 时 JSON/XML 按该字节预算分片导出。
+    生成器: 先yield进度，最后yield (stats, outputs, tree_content)。
+    """
+    result_dir = Path(result_dir)
+    outputs = {
+        "json": result_dir / content_file,
+        "xml": result_dir / xml_file,
+        "tree": result_dir / tree_file,
+    }
+    builder = TreeBuilder(metrics=metrics)
+    pipeline = MultiSinkPipeline(read_workers, blob_cache, metrics)
+    pipeline.add(make_writer(Writer, read_workers, shard_budget, manifest, metrics=metrics), outputs["json"])
+    pipeline.add(make_writer(XmlWriter, read_workers, shard_budget, manifest, metrics=metrics), outputs["xml"])
+    pipeline.add(builder, outputs["tree"])
+    if archive_file:
+        outputs["archive"] = result_dir / archive_file
+        pipeline.add(ArchiveWriter(read_workers, archive_codec, manifest=manifest, metrics=metrics), outputs["archive"])
+
+    sink_stats = None
+    for result in pipeline.run(entries_generator):
+        if isinstance(result, (int, float)):
+            yield result
+        else:
+            sink_stats = result
+
+    outputs["json"] = output_path_for(outputs["json"], shard_budget)
+    outputs["xml"] = output_path_for(outputs["xml"], shard_budget)
+    stats = dict(sink_stats[0])
+    stats["outputs"] = {name: str(path) for name, path in outputs.items()}
+    yield stats, outputs, builder.tree_content
@@ -0,0 +1,212 @@
+"""
+紧凑的二进制归档格式 (.psa)，只依赖标准库的 zlib / lzma:
+
+    [文件头]   MAGIC (8 字节) + 压缩方式 (1 字节)
+    [数据块]   文件内容 (UTF-8) 依次拼接后按 CHUNK_SIZE 切块，每块独立压缩
+    [索引]     压缩后的 JSON: {"chunks": [[偏移, 压缩长度, 原始长度], ...],
+                                "files": [[相对路径, 起始块, 块内偏移, 字节长度], ...]}
+    [文件尾]   索引偏移 (8 字节) + 索引长度 (8 字节) + MAGIC (8 字节)
+
+读取单个文件时只需解压它所在的数据块，不必解压整个归档。
+"""
+from utils.ProjectStructureExtract import EntryType
+from utils.ContentReader import ContentReader, DEFAULT_WORKERS
+from utils.AtomicFile import AtomicFile
+from pathlib import Path
+import json
+import struct
+import zlib
+
+MAGIC = b"PSEARC01"
+CHUNK_SIZE = 1024 * 1024
+HEADER = struct.Struct("<8sB")
+FOOTER = struct.Struct("<QQ8s")
+
+def _lzma_compress(data):
+    # 延迟导入: 只有选择 lzma 时才加载
+    import lzma
+    return lzma.compress(data, preset=6)
+
+def _lzma_decompress(data):
+    import lzma
+    return lzma.decompress(data)
+
+CODECS = {
+    "zlib": (0, lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (1, _lzma_compress, _lzma_decompress),
+}
+CODEC_NAMES = {codec_id: name for name, (codec_id, _, _) in CODECS.items()}
+
+class ArchiveWriter:
+    """第四种输出端: 与 Writer / XmlWriter 接口相同，把文件内容写入分块压缩的归档"""
+    def __init__(self, read_workers=DEFAULT_WORKERS, codec="zlib", manifest=None, blob_cache=None, metrics=None):
+        if codec not in CODECS:
+            raise ValueError(f"不支持的压缩方式: {codec}（可选: {', '.join(CODECS)}）")
+        self.reader = ContentReader(read_workers, blob_cache=blob_cache, metrics=metrics)
+        # 可选的 StageMetrics (utils.StageMetrics): 记录压缩耗时和写入字节数
+        self.metrics = metrics
+        self.codec = codec
+        self._compress = CODECS[codec][1]
+        # 归档不复用片段，只把处理过的文件记入扫描清单
+        self.manifest = manifest
+        self._goal_file = None
+        self._atomic = None
+        self._chunk = bytearray()
+        self._chunks = []
+        self._files = []
+        self._offset = 0
+        self.file_count = 0
+        self.dir_count = 0
+
+    def updateFile(self, filename, entries_generator):
+        """根据条目生成器生成归档文件，先yield进度，最后yield统计信息"""
+        self.begin(filename)
+        try:
+            for entry, progress, content in self.reader.iter_contents(entries_generator):
+                self.addEntry(entry, content)
+                if entry.type != EntryType.DIRECTORY:
+                    yield progress
+        except BaseException:
+            self.abort()
+            raise
+
+        yield self.finish()
+
+    # ===== 输出端接口: 供 updateFile 以及多输出流水线 (utils.Pipeline) 调用 =====
+
+    def begin(self, filename):
+        self._goal_file = Path(filename)
+        self.file_count = 0
+        self.dir_count = 0
+        self._chunk = bytearray()
+        self._chunks = []
+        self._files = []
+        self._atomic = AtomicFile(self._goal_file, 'wb')
+        self._atomic.file.write(HEADER.pack(MAGIC, CODECS[self.codec][0]))
+        self._offset = HEADER.size
+
+    def needsContent(self, entry):
+        return True
+
+    def addEntry(self, entry, content):
+        if entry.type == EntryType.DIRECTORY:
+            self.dir_count += 1
+            return
+
+        data = content.encode('utf-8')
+        self._files.append([entry.rel_path, len(self._chunks), len(self._chunk), len(data)])
+        self.file_count += 1
+        if self.manifest is not None:
+            self.manifest.remember(entry)
+
+        # 大文件会跨越多个连续的数据块
+        view = memoryview(data)
+        while view:
+            room = CHUNK_SIZE - len(self._chunk)
+            self._chunk += view[:room]
+            view = view[room:]
+            if len(self._chunk) >= CHUNK_SIZE:
+                self._flush_chunk()
+
+    def finish(self):
+        goal_file = self._goal_file
+        if self._chunk:
+            self._flush_chunk()
+        index = json.dumps({"chunks": self._chunks, "files": self._files},
+                           ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        index = self._compress(index)
+        out = self._atomic.file
+        out.write(index)
+        out.write(FOOTER.pack(self._offset, len(index), MAGIC))
+        self._atomic.commit()
+        if self.metrics is not None:
+            self.metrics.count("bytes_written", self._offset + len(index) + FOOTER.size)
+        self._chunks, self._files = [], []
+        if self.manifest is not None:
+            self.manifest.record_output(goal_file, {})
+
+        stats = {"files": self.file_count, "dirs": self.dir_count}
+        print(f"归档文件已生成：{goal_file.resolve()}，共 {self.file_count} 个文件。")
+        return stats
+
+    def abort(self):
+        """丢弃写了一半的临时文件，保留原有输出"""
+        if self._atomic is not None:
+            self._atomic.discard()
+        self._chunk = bytearray()
+
+    def _flush_chunk(self):
+        if self.metrics is None:
+            compressed = self._compress(bytes(self._chunk))
+        else:
+            compressed = self.metrics.timed("compress", self._compress, bytes(self._chunk))
+        self._atomic.file.write(compressed)
+        self._chunks.append([self._offset, len(compressed), len(self._chunk)])
+        self._offset += len(compressed)
+        self._chunk = bytearray()
+
+class ArchiveReader:
+    """
+    读取 .psa 归档: read(rel_path) 只解压该文件所在的数据块，
+    迭代时按写入顺序逐块解压，内存占用取决于数据块大小和最大的单个文件。
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self._f = open(self.path, 'rb')
+        try:
+            self._load_index()
+        except Exception:
+            self._f.close()
+            raise
+        self._cached_chunk = (None, None)
+
+    def _load_index(self):
+        magic, codec_id = HEADER.unpack(self._f.read(HEADER.size))
+        self._f.seek(-FOOTER.size, 2)
+        index_offset, index_length, end_magic = FOOTER.unpack(self._f.read(FOOTER.size))
+        if magic != MAGIC or end_magic != MAGIC or codec_id not in CODEC_NAMES:
+            raise ValueError(f"不是有效的归档文件: {self.path}")
+        self.codec = CODEC_NAMES[codec_id]
+        self._decompress = CODECS[self.codec][2]
+        self._f.seek(index_offset)
+        index = json.loads(self._decompress(self._f.read(index_length)).decode('utf-8'))
+        self.chunks = index["chunks"]
+        self.files = {rel_path: (chunk, offset, length) for rel_path, chunk, offset, length in index["files"]}
+        # 保持写入顺序
+        self._order = [item[0] for item in index["files"]]
+
+    def _chunk(self, number):
+        if self._cached_chunk[0] != number:
+            offset, compressed_length, _ = self.chunks[number]
+            self._f.seek(offset)
+            self._cached_chunk = (number, self._decompress(self._f.read(compressed_length)))
+        return self._cached_chunk[1]
+
+    def names(self):
+        return list(self._order)
+
+    def read(self, rel_path):
+        """返回单个文件的文本内容，不存在时抛出 KeyError"""
+        chunk, offset, length = self.files[rel_path]
+        parts = []
+        while length > 0:
+            data = self._chunk(chunk)
+            part = data[offset:offset + length]
+            parts.append(part)
+            length -= len(part)
+            chunk, offset = chunk + 1, 0
+        return b"".join(parts).decode('utf-8')
+
+    def __iter__(self):
+        """按写入顺序yield (相对路径, 文件内容)"""
+        for rel_path in self._order:
+            yield rel_path, self.read(rel_path)
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,22 +1,116 @@
+from utils.ContentReader import DEFAULT_WORKERS
+from utils.ProjectArchive import ArchiveReader
+from utils.ExportIndex import ExportReader, load_index
+from collections import deque
 import json
 import xml.etree.ElementTree as ET
 from pathlib import Path
 import os
 
+READ_CHUNK_SIZE = 1024 * 1024
+# 并发还原时每个写入任务包含的文件数量/字节数上限
+WRITE_BATCH_FILES = 64
+WRITE_BATCH_BYTES = 1024 * 1024
+# 统计信息（及历史记录）中最多列出的失败文件数，其余只计数
+MAX_REPORTED_FAILURES = 20
+
+class _JsonObjectStream:
+    """
+    增量读取顶层为对象的 JSON 文件，逐个yield (key, value)。
+    缓冲区只保留尚未解析的部分，内存占用取决于最大的单个值，而不是整个文件。
+    """
+    _WHITESPACE = ' \t\n\r'
+
+    def __init__(self, f, chunk_size=READ_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, min_size=0):
+        """读取更多数据；一次至少读取与现有缓冲区等量的内容，避免超长字符串被反复重新解析"""
+        if self.eof:
+            return False
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(max(self.chunk_size, min_size))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def _peek(self):
+        """跳过空白并返回下一个字符，文件结束时返回空字符串"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self._WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"JSON 格式错误: 位置附近应为 '{char}'，实际为 '{found or '文件结尾'}'")
+        self.pos += 1
+
+    def _value(self):
+        """解析当前位置的一个值；值被缓冲区截断时补充数据后重新解析"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill(len(self.buf)):
+                    continue
+                raise
+            # 数字等值可能恰好在缓冲区末尾被截断，确认其后还有内容或已到文件结尾
+            if end < len(self.buf) or self.eof or not self._fill(len(self.buf)):
+                self.pos = end
+                return value
+
+    def __iter__(self):
+        self._expect('{')
+        if self._peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            if self._peek() != '"':
+                raise ValueError("JSON 格式错误: 对象的键必须是字符串")
+            key = self._value()
+            self._expect(':')
+            yield key, self._value()
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            self._expect('}')
+            return
+
 class ProjectRestorer:
-    def __init__(self, source_file, target_root):
+    def __init__(self, source_file, target_root, workers=DEFAULT_WORKERS, only=None):
         self.source_file = Path(source_file)
         self.target_root = Path(target_root)
-        self.file_contents = {}
+        # 只还原指定的相对路径；从归档还原时只解压这些文件所在的数据块
+        self.only = set(only) if only else None
+        # 并发写文件的线程数，为 1 时串行写入
+        self.workers = max(1, int(workers or 1))
+        self._created_dirs = set()
+        self._failed_dirs = {}
 
     def restore(self):
         """
         执行还原操作，并返回统计信息。
         """
         try:
-            self._load_data()
-            stats = self._create_files()
+            stats = self._create_files(self.iter_file_contents())
             message = f"项目已成功还原到:\n{self.target_root}"
+            if stats["failed"]:
+                message += f"\n其中 {stats['failed']} 个文件写入失败。"
             print(message)
             return True, message, stats
         except Exception as e:
@@ -24,41 +118,184 @@ class ProjectRestorer:
             print(error_message)
             return False, error_message, None
 
-    def _load_data(self):
+    def iter_file_contents(self):
+        """
+        流式解析源文件，逐个yield (相对路径, 文件内容)，不会把整个文件读入内存。
+        """
         ext = self.source_file.suffix.lower()
+        if ext in ('.json', '.xml') and self.only is not None and load_index(self.source_file) is not None:
+            # 只还原部分文件且有随机访问索引时，按偏移直接读取，不解析整个文档
+            return self._iter_indexed()
         if ext == '.json':
-            with open(self.source_file, 'r', encoding='utf-8') as f:
-                self.file_contents = json.load(f)
+            contents = self._iter_json()
         elif ext == '.xml':
-            tree = ET.parse(self.source_file)
-            root = tree.getroot()
-            for file_element in root.findall('file'):
-                path = file_element.get('path')
-                content_element = file_element.find('content')
-                content = content_element.text if content_element is not None else ""
-                if path:
-                    self.file_contents[path] = content
+            contents = self._iter_xml()
+        elif ext == '.psa':
+            return self._iter_archive()
         else:
             raise ValueError(f"不支持的文件类型: {ext}")
+        if self.only is not None:
+            return ((rel_path, content) for rel_path, content in contents if rel_path in self.only)
+        return contents
 
-    def _create_files(self):
-        if not self.file_contents:
-            raise ValueError("源文件中没有找到可还原的文件内容。")
+    def _iter_indexed(self):
+        with ExportReader(self.source_file) as export:
+            for rel_path in export.names():
+                if rel_path in self.only:
+                    yield rel_path, export.read(rel_path)
 
-        file_count = 0
-        sorted_paths = sorted(self.file_contents.keys())
-
-        for rel_path, content in self.file_contents.items():
-            os_rel_path = Path(rel_path)
-            full_path = self.target_root / os_rel_path
-            
-            full_path.parent.mkdir(parents=True, exist_ok=True)
-            
+    def _iter_archive(self):
+        with ArchiveReader(self.source_file) as archive:
+            if self.only is None:
+                yield from archive
+                return
+            for rel_path in archive.names():
+                if rel_path in self.only:
+                    yield rel_path, archive.read(rel_path)
+
+    def _iter_json(self):
+        with open(self.source_file, 'r', encoding='utf-8') as f:
+            yield from _JsonObjectStream(f)
+
+    def _iter_xml(self):
+        depth = 0
+        root = None
+        for event, element in ET.iterparse(self.source_file, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                depth += 1
+                continue
+            depth -= 1
+            # 只处理根元素下的直接子元素 <file>，处理完立即清除，避免整棵树留在内存中
+            if depth == 1 and element.tag == 'file':
+                path = element.get('path')
+                content_element = element.find('content')
+                # 空的 CDATA 解析后 text 为 None
+                content = (content_element.text or "") if content_element is not None else ""
+                if path:
+                    yield path, content
+                element.clear()
+                root.remove(element)
+
+    def _ensure_dir(self, directory):
+        """
+        每个目录只创建一次: 条目按解析顺序到达，mkdir(parents=True) 自然先建父目录，
+        创建后把该目录及其所有上级目录记入集合，之后同一目录下的文件不再调用 mkdir。
+        """
+        if directory in self._created_dirs:
+            return
+        if directory in self._failed_dirs:
+            raise self._failed_dirs[directory]
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            self._failed_dirs[directory] = e
+            raise
+        while directory not in self._created_dirs:
+            self._created_dirs.add(directory)
+            if directory == self.target_root or directory.parent == directory:
+                break
+            directory = directory.parent
+
+    def _write_batch(self, batch):
+        """写入一批文件，返回 [(相对路径, 完整路径, 异常或 None), ...]"""
+        results = []
+        for rel_path, full_path, content in batch:
             try:
                 full_path.write_text(content, encoding='utf-8')
-                file_count += 1
+                results.append((rel_path, full_path, None))
             except Exception as e:
-                print(f"无法写入文件 {full_path}: {e}")
-                continue
-        
-        return {"files": file_count}
+                results.append((rel_path, full_path, e))
+        return results
+
+    def _create_files(self, file_contents):
+        """
+        在主线程中解析并创建目录，文件按批（约 WRITE_BATCH_BYTES 字节或 WRITE_BATCH_FILES 个）
+        交给有界线程池并发写入，同时在途的批次不超过 workers * 2 个，内存占用仍然有界。
+        单个文件失败不会中断还原，失败数和前 MAX_REPORTED_FAILURES 个失败的文件记录在统计信息中。
+        """
+        file_count = 0
+        entry_count = 0
+        failed = 0
+        failures = []
+
+        pool = None
+        if self.workers > 1:
+            # 延迟导入: 串行还原和命令行冷启动用不到 concurrent.futures
+            from concurrent.futures import ThreadPoolExecutor
+            pool = ThreadPoolExecutor(max_workers=self.workers)
+        window = deque()
+        batch = []
+        batch_bytes = 0
+        # 只记录尚未写完的路径（当前批次和在途批次），数量有界，不随项目大小增长
+        pending_paths = set()
+
+        def fail(rel_path, full_path, error):
+            nonlocal failed
+            failed += 1
+            if failed <= MAX_REPORTED_FAILURES:
+                print(f"无法写入文件 {full_path}: {error}")
+                failures.append({"path": rel_path, "error": str(error)})
+
+        def collect(results):
+            nonlocal file_count
+            for rel_path, full_path, error in results:
+                pending_paths.discard(full_path)
+                if error is None:
+                    file_count += 1
+                else:
+                    fail(rel_path, full_path, error)
+
+        def submit():
+            nonlocal batch, batch_bytes
+            if batch:
+                if pool is None:
+                    collect(self._write_batch(batch))
+                else:
+                    window.append(pool.submit(self._write_batch, batch))
+                batch, batch_bytes = [], 0
+
+        def drain(limit=0):
+            while len(window) > limit:
+                collect(window.popleft().result())
+
+        try:
+            for rel_path, content in file_contents:
+                entry_count += 1
+                os_rel_path = Path(rel_path)
+                full_path = self.target_root / os_rel_path
+
+                try:
+                    self._ensure_dir(full_path.parent)
+                except OSError as e:
+                    fail(rel_path, full_path, e)
+                    continue
+
+                if full_path in pending_paths:
+                    # 同一路径在尚未写完时再次出现: 先写完之前的所有批次，保证与串行写入一样后者覆盖前者
+                    submit()
+                    drain()
+                pending_paths.add(full_path)
+
+                batch.append((rel_path, full_path, content))
+                batch_bytes += len(content)
+                if batch_bytes >= WRITE_BATCH_BYTES or len(batch) >= WRITE_BATCH_FILES:
+                    submit()
+                    drain(self.workers * 2)
+
+            submit()
+            drain()
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+        if not entry_count:
+            raise ValueError("源文件中没有找到可还原的文件内容。")
+
+        return {
+            "files": file_count,
+            "dirs": len(self._created_dirs - {self.target_root}),
+            "failed": failed,
+            "failures": failures,
+        }
@@ -1,16 +1,52 @@
 import os
+import threading
 from enum import Enum, auto
+from time import perf_counter
+from utils.ContentClassifier import classify_extension
+from utils.GitIgnore import GITIGNORE_FILE, GitIgnoreRules, is_ignored
 
 class EntryType(Enum):
     DIRECTORY = auto()
     FILE = auto()
     BINARY_FILE = auto()
+    PENDING_FILE = auto()  # 尚未判定文本/二进制，由读取阶段(ContentReader)判定
+
+class ScanCancelled(Exception):
+    """扫描过程中 cancel_event 被设置"""
+
+class ScanDirectory:
+    """扫描到的一个目录: 同一目录下的所有条目共享这一个对象，完整路径前缀只保存一份"""
+    __slots__ = ("path_prefix", "rel_prefix")
+
+    def __init__(self, path, rel_dir):
+        # 以路径分隔符结尾（根目录的相对前缀为空串），与文件名直接拼接即得到完整路径
+        self.path_prefix = os.path.join(path, "")
+        self.rel_prefix = os.path.join(rel_dir, "") if rel_dir else ""
 
 class FileSystemEntry:
-    def __init__(self, path, entry_type, rel_path):
-        self.path = path
+    """
+    扫描产出的条目。只保存所在目录 (ScanDirectory) 和文件名，
+    path / rel_path 在访问时拼接得到；使用 __slots__，没有实例 __dict__。
+    """
+    __slots__ = ("parent", "name", "type", "stat", "record", "encoding", "digest")
+
+    def __init__(self, parent, name, entry_type):
+        self.parent = parent
+        self.name = name
         self.type = entry_type
-        self.rel_path = rel_path
+        # 以下字段仅在启用 ScanManifest 时使用
+        self.stat = None      # (size, mtime_ns, inode)
+        self.record = None    # 清单中与当前 stat 匹配的缓存记录
+        self.encoding = None  # 读取阶段实际使用的解码方式
+        self.digest = None    # 文件内容哈希
+
+    @property
+    def path(self):
+        return self.parent.path_prefix + self.name
+
+    @property
+    def rel_path(self):
+        return self.parent.rel_prefix + self.name
 
     def __repr__(self):
         return f"FileSystemEntry(path='{self.path}', type='{self.type.name}')"
@@ -22,56 +58,344 @@ def is_binary(file_path):
     except Exception:
         return True
 
+def _is_dir(dir_entry):
+    try:
+        return dir_entry.is_dir()
+    except OSError:
+        return False
+
+def _is_symlink(dir_entry):
+    try:
+        return dir_entry.is_symlink()
+    except OSError:
+        return False
+
+class _StatEntry:
+    """并行扫描时代替 DirEntry 从子进程传回: 只保存名称和扫描时取得的 stat"""
+    __slots__ = ("name", "path", "_stat")
+
+    def __init__(self, dir_entry):
+        self.name = dir_entry.name
+        self.path = dir_entry.path
+        try:
+            self._stat = dir_entry.stat()
+        except OSError:
+            self._stat = None
+
+    def stat(self):
+        if self._stat is None:
+            raise OSError(f"无法读取文件信息: {self.path}")
+        return self._stat
+
+# 扫描缓存中文件的保存形式
+def _file_name(dir_entry):
+    return dir_entry.name
+
+def _file_dir_entry(dir_entry):
+    return dir_entry
+
+def _file_stat_entry(dir_entry):
+    return _StatEntry(dir_entry)
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _apply_gitignore(rel_dir, chain, dir_entries, file_entries, mtimes=None):
+    """读取本目录的 .gitignore 加入规则链，并去掉被忽略的目录和文件"""
+    for dir_entry in file_entries:
+        if dir_entry.name == GITIGNORE_FILE:
+            if mtimes is not None:
+                # 先取修改时间再读取: 读取之后的修改一定会使记录的修改时间失效
+                mtimes.append((dir_entry.path, _mtime(dir_entry.path)))
+            rules = GitIgnoreRules.from_file(dir_entry.path)
+            if rules:
+                prefix = rel_dir.replace(os.sep, '/') + '/' if rel_dir else ''
+                chain = chain + ((prefix, rules),)
+            break
+    if not chain:
+        return chain, dir_entries, file_entries
+
+    base = rel_dir.replace(os.sep, '/') + '/' if rel_dir else ''
+    dir_entries = [e for e in dir_entries if not is_ignored(chain, base + e.name, True)]
+    file_entries = [e for e in file_entries if not is_ignored(chain, base + e.name, False)]
+    return chain, dir_entries, file_entries
+
+def _walk(stack, ignore_dirs, use_gitignore, file_item, listing, limit=None, cancel_event=None, mtimes=None):
+    """
+    深度优先遍历栈中的目录，把 (ScanDirectory, [目录名], [file_item(文件 DirEntry)]) 依次追加到 listing，返回条目数。
+    栈中每项: (目录路径, 相对路径, 生效的 .gitignore 规则链 [(以 / 结尾的相对路径前缀, 规则), ...])。
+    指定 limit 时最多处理 limit 个目录，尚未处理的子目录留在栈中。
+    每个目录开始前检查 cancel_event，已设置时抛出 ScanCancelled。
+    指定 mtimes 列表时，在列出每个目录（和读取 .gitignore）之前把 (路径, 修改时间) 追加到其中。
+    """
+    count = 0
+    while stack and limit != 0:
+        if cancel_event is not None and cancel_event.is_set():
+            raise ScanCancelled()
+        if limit is not None:
+            limit -= 1
+        current_path, rel_dir, chain = stack.pop()
+        dir_entries = []
+        file_entries = []
+        if mtimes is not None:
+            mtimes.append((current_path, _mtime(current_path)))
+        try:
+            with os.scandir(current_path) as it:
+                for dir_entry in it:
+                    if _is_dir(dir_entry):
+                        if dir_entry.name not in ignore_dirs:
+                            dir_entries.append(dir_entry)
+                    else:
+                        file_entries.append(dir_entry)
+        except OSError as e:
+            if not rel_dir:
+                print(f"扫描时无法访问目录 {current_path}: {e}")
+            continue
+
+        if use_gitignore:
+            chain, dir_entries, file_entries = _apply_gitignore(rel_dir, chain, dir_entries, file_entries, mtimes)
+
+        count += len(dir_entries) + len(file_entries)
+
+        # 与 os.walk 相同: 不跟随符号链接目录；倒序入栈以保持原有的遍历顺序
+        for dir_entry in reversed(dir_entries):
+            if not _is_symlink(dir_entry):
+                stack.append((dir_entry.path, os.path.join(rel_dir, dir_entry.name), chain))
+
+        listing.append((ScanDirectory(current_path, rel_dir),
+                        [dir_entry.name for dir_entry in dir_entries],
+                        [file_item(dir_entry) for dir_entry in file_entries]))
+    return count
+
+def _scan_subtree(task):
+    """进程池任务: 完整扫描一棵子树，返回 (listing, 条目数, 修改时间列表或 None)"""
+    path, rel_dir, chain, ignore_dirs, use_gitignore, file_item, record_mtimes = task
+    listing = []
+    mtimes = [] if record_mtimes else None
+    count = _walk([(path, rel_dir, chain)], ignore_dirs, use_gitignore, file_item, listing, mtimes=mtimes)
+    return listing, count, mtimes
+
+# 并行扫描的进程池在进程内共享: 监视模式每次轮询都会扫描，不必每次都重新启动子进程
+_scan_pool = None
+_scan_pool_workers = 0
+_scan_pool_lock = threading.Lock()
+
+def _init_scan_worker():
+    # 子进程常驻在共享进程池中: Ctrl+C 只由主进程处理，由主进程退出时统一关闭进程池
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _get_scan_pool(workers):
+    """返回共享的进程池，进程数变化时重新创建。使用 spawn: 界面和读取线程池运行时 fork 可能复制已持有的锁"""
+    global _scan_pool, _scan_pool_workers
+    with _scan_pool_lock:
+        if _scan_pool is None or _scan_pool_workers != workers:
+            # 延迟导入: 单进程扫描用不到 concurrent.futures 和 multiprocessing
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            if _scan_pool is not None:
+                _scan_pool.shutdown(wait=False, cancel_futures=True)
+            _scan_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_scan_worker)
+            _scan_pool_workers = workers
+        return _scan_pool
+
+def _discard_scan_pool(pool):
+    """进程池已损坏（子进程异常退出等）时丢弃，下次扫描重新创建"""
+    global _scan_pool, _scan_pool_workers
+    with _scan_pool_lock:
+        if _scan_pool is pool:
+            _scan_pool = None
+            _scan_pool_workers = 0
+    pool.shutdown(wait=False, cancel_futures=True)
+
 class Extractor:
-    def __init__(self, root_dir, ignore_dirs=None, ignore_file_types=None):
+    def __init__(self, root_dir, ignore_dirs=None, ignore_file_types=None, detect_binary=True, manifest=None,
+                 use_gitignore=False, scan_workers=1, metrics=None, cancel_event=None, record_mtimes=False,
+                 keep_stat=False):
         self.root_dir = root_dir
         self.ignore_dirs = set(ignore_dirs) if ignore_dirs else set()
         self.ignore_file_types = set(ft.lower() for ft in ignore_file_types) if ignore_file_types else set()
+        # 为 False 时不在遍历阶段打开文件嗅探二进制，未被忽略的文件以 PENDING_FILE 产出
+        self.detect_binary = detect_binary
+        # 可选的 ScanManifest: 未变化的文件直接沿用缓存的类型，不再打开
+        self.manifest = manifest
+        # 为 True 时遵循各级目录中的 .gitignore，被忽略的目录整棵子树都不会进入
+        self.use_gitignore = use_gitignore
+        # 大于 1 时用多个进程并行扫描根目录下的各个子目录
+        self.scan_workers = max(1, int(scan_workers or 1))
+        # 可选的 StageMetrics: 记录遍历和嗅探耗时
+        self.metrics = metrics
+        # 可选的 threading.Event: 被设置后扫描尽快以 ScanCancelled 结束（如界面上输入了新的根目录）
+        self.cancel_event = cancel_event
+        # 为 True 时在扫描过程中记录各目录（及 .gitignore）的修改时间，见 validation_mtimes()
+        self.record_mtimes = record_mtimes
+        # 为 True 时（或启用清单时）文件条目的 entry.stat 取自扫描时的 DirEntry，使用方不必再 os.stat（如监视模式）
+        self.keep_stat = keep_stat
+        self._keep_entries = manifest is not None or keep_stat
+        self._mtimes = None
         self.total_items = 0
+        # 扫描缓存: [(ScanDirectory, [目录名], [文件名或文件 DirEntry / _StatEntry]), ...]
+        # 只在启用清单或 keep_stat 时保留文件的 DirEntry（Windows 上其 stat() 无需额外的系统调用），否则只保存名称
+        self._listing = None
 
-    def count_items(self):
-        """第一遍扫描：快速计数文件和目录总数"""
-        count = 0
-        try:
-            for _, dir_names, file_names in os.walk(self.root_dir, topdown=True):
-                dir_names[:] = [d for d in dir_names if d not in self.ignore_dirs]
-                count += len(dir_names) + len(file_names)
-        except OSError as e:
-            print(f"计数时无法访问目录 {self.root_dir}: {e}")
+    def _scan(self):
+        """
+        使用 os.scandir 进行唯一一次非递归遍历，缓存每个目录下的名称列表。
+        遍历顺序与 os.walk(topdown=True) 一致；被忽略的目录不会进入，也不会被计数。
+        启用 use_gitignore 时，每个目录先读取其中的 .gitignore，再与上级目录的规则一起过滤本目录的条目。
+        scan_workers 大于 1 时，根目录下的各个子目录分给多个进程并行扫描，再按原有顺序合并。
+        """
+        start = perf_counter()
+        listing = []
+        file_item = _file_dir_entry if self._keep_entries else _file_name
+        stack = [(self.root_dir, "", ())]
+        mtimes = [] if self.record_mtimes else None
+        if self.scan_workers > 1:
+            # 先只列出根目录，此时栈中剩下的就是各个顶层子目录
+            count = _walk(stack, self.ignore_dirs, self.use_gitignore, file_item, listing, 1, self.cancel_event, mtimes)
+            count += self._scan_parallel(stack, listing, file_item, mtimes)
+        else:
+            count = _walk(stack, self.ignore_dirs, self.use_gitignore, file_item, listing,
+                          cancel_event=self.cancel_event, mtimes=mtimes)
+
+        self._listing = listing
+        self._mtimes = mtimes
         self.total_items = count
+        if self.metrics is not None:
+            self.metrics.add("walk", perf_counter() - start, scanned_items=count)
+        return listing
+
+    def _scan_parallel(self, stack, listing, file_item, mtimes=None):
+        """用进程池扫描栈中的各个子树；深度优先时每棵子树的条目是连续的，按顺序拼接即与单进程结果一致"""
+        results = self._map_subtrees(list(reversed(stack))) if len(stack) > 1 else None
+        if results is None:
+            return _walk(stack, self.ignore_dirs, self.use_gitignore, file_item, listing,
+                         cancel_event=self.cancel_event, mtimes=mtimes)
+        stack.clear()
+        count = 0
+        for sub_listing, sub_count, sub_mtimes in results:
+            listing.extend(sub_listing)
+            count += sub_count
+            if mtimes is not None:
+                mtimes.extend(sub_mtimes)
         return count
 
+    def _map_subtrees(self, subtrees):
+        """在子进程中扫描各棵子树，按顺序返回 [(listing, 条目数), ...]；无法创建子进程（受限环境等）时返回 None"""
+        # 子进程中的 DirEntry 无法传回，启用清单时在子进程中顺带取得 stat
+        file_item = _file_stat_entry if self._keep_entries else _file_name
+        tasks = [(path, rel_dir, chain, self.ignore_dirs, self.use_gitignore, file_item, self.record_mtimes)
+                 for path, rel_dir, chain in subtrees]
+        pool = None
+        try:
+            pool = _get_scan_pool(self.scan_workers)
+            futures = [pool.submit(_scan_subtree, task) for task in tasks]
+        except (OSError, RuntimeError) as e:
+            if pool is not None:
+                _discard_scan_pool(pool)
+            print(f"并行扫描失败，改为单进程扫描: {e}")
+            return None
+        try:
+            results = []
+            # 子进程无法检查 cancel_event，每完成一棵子树检查一次；取消时撤下尚未开始的子树，不等待正在扫描的
+            for future in futures:
+                result = future.result()
+                if self.cancel_event is not None and self.cancel_event.is_set():
+                    raise ScanCancelled()
+                results.append(result)
+            return results
+        except (OSError, RuntimeError) as e:
+            # BrokenProcessPool 也是 RuntimeError
+            _discard_scan_pool(pool)
+            print(f"并行扫描失败，改为单进程扫描: {e}")
+            return None
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def count_items(self):
+        """扫描一遍并缓存目录列表，返回文件和目录总数"""
+        self._scan()
+        return self.total_items
+
+    def validation_mtimes(self):
+        """
+        扫描结果所依赖的 [(路径, 修改时间), ...]: 扫描到的所有目录，启用 use_gitignore 时还包括读取的 .gitignore。
+        修改时间在列出目录、读取 .gitignore 之前取得，扫描期间发生的修改也会使其失效；
+        这些修改时间都未变化时，目录下没有增删条目，扫描结果（条目数）仍然有效。需要 record_mtimes=True。
+        """
+        if self._listing is None:
+            self._scan()
+        return self._mtimes
+
     def extract_project_structure(self):
-        """第二遍扫描：作为生成器，处理并yield每个条目和进度"""
+        """作为生成器，基于缓存的扫描结果处理并yield每个条目和进度（未扫描时先扫描一次）"""
+        listing = self._listing if self._listing is not None else self._scan()
+        total = self.total_items
         processed_items = 0
+
+        for directory, dir_entries, file_entries in listing:
+            for name in dir_entries:
+                processed_items += 1
+                progress = (processed_items / total) * 100 if total > 0 else 0
+                yield FileSystemEntry(directory, name, EntryType.DIRECTORY), progress
+
+            for item in file_entries:
+                processed_items += 1
+                progress = (processed_items / total) * 100 if total > 0 else 0
+                name = item.name if self._keep_entries else item
+                ext = os.path.splitext(name)[1].lower()
+
+                if ext in self.ignore_file_types:
+                    entry = FileSystemEntry(directory, name, EntryType.BINARY_FILE)
+                elif self.manifest is not None:
+                    entry = self._entry_from_manifest(directory, item, ext)
+                else:
+                    entry = FileSystemEntry(directory, name, self._classify(directory.path_prefix + name, ext))
+                if self.keep_stat and entry.stat is None:
+                    try:
+                        st = item.stat()
+                        entry.stat = (st.st_size, st.st_mtime_ns, st.st_ino)
+                    except OSError:
+                        pass
+
+                yield entry, progress
+
+    def _classify(self, full_path, ext):
+        """
+        未命中清单缓存时的判定: 已知二进制扩展名直接判定，不打开文件；
+        其余文件在 detect_binary=False 时交给读取阶段在唯一一次读取中判定，
+        否则已知文本扩展名也跳过嗅探（读取阶段仍会检查头部中的 NUL 字节）。
+        """
+        known_binary = classify_extension(ext)
+        if known_binary:
+            return EntryType.BINARY_FILE
+        if not self.detect_binary:
+            return EntryType.PENDING_FILE
+        if known_binary is False:
+            return EntryType.FILE
+        binary = is_binary(full_path) if self.metrics is None else self.metrics.timed("sniff", is_binary, full_path)
+        return EntryType.BINARY_FILE if binary else EntryType.FILE
+
+    def _entry_from_manifest(self, directory, dir_entry, ext):
         try:
-            for current_path, dir_names, file_names in os.walk(self.root_dir, topdown=True):
-                original_dirs = list(dir_names)
-                dir_names[:] = [d for d in dir_names if d not in self.ignore_dirs]
-                
-                for dir_name in original_dirs:
-                    processed_items += 1
-                    progress = (processed_items / self.total_items) * 100 if self.total_items > 0 else 0
-                    if dir_name not in self.ignore_dirs:
-                        full_path = os.path.join(current_path, dir_name)
-                        rel_path = os.path.relpath(full_path, self.root_dir)
-                        entry = FileSystemEntry(full_path, EntryType.DIRECTORY, rel_path)
-                        yield entry, progress
-
-                for file_name in file_names:
-                    processed_items += 1
-                    progress = (processed_items / self.total_items) * 100 if self.total_items > 0 else 0
-                    full_path = os.path.join(current_path, file_name)
-                    rel_path = os.path.relpath(full_path, self.root_dir)
-                    
-                    ext = os.path.splitext(file_name)[1].lower()
-                    
-                    if ext in self.ignore_file_types or is_binary(full_path):
-                        entry = FileSystemEntry(full_path, EntryType.BINARY_FILE, rel_path)
-                    else:
-                        entry = FileSystemEntry(full_path, EntryType.FILE, rel_path)
-                    
-                    yield entry, progress
+            st = dir_entry.stat()
+        except OSError:
+            return FileSystemEntry(directory, dir_entry.name, EntryType.BINARY_FILE)
 
-        except OSError as e:
-            print(f"提取时无法访问目录 {self.root_dir}: {e}")
+        record = self.manifest.lookup(directory.rel_prefix + dir_entry.name, st)
+        if record is not None:
+            entry_type = EntryType.BINARY_FILE if record.is_binary else EntryType.FILE
+            if self.metrics is not None:
+                self.metrics.count("manifest_hits")
+        else:
+            entry_type = self._classify(dir_entry.path, ext)
+
+        entry = FileSystemEntry(directory, dir_entry.name, entry_type)
+        entry.stat = (st.st_size, st.st_mtime_ns, st.st_ino)
+        entry.record = record
+        return entry
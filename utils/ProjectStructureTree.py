@@ -1,68 +1,117 @@
 from utils.ProjectStructureExtract import EntryType
+from utils.AtomicFile import atomic_open
+import io
 import os
 from pathlib import Path
 
 class TreeBuilder:
-    def __init__(self):
-        self.entries = []
+    """
+    输出端: 生成 Markdown 目录树。addEntry 只把路径插入嵌套字典并计数，不保留条目对象；
+    finish 用显式栈按“文件在前、目录在后，各自按名称排序”的顺序逐行生成，边生成边写入文件。
+    """
+    def __init__(self, keep_content=True, metrics=None):
+        # 为 False 时不在内存中保留完整的目录树文本（命令行模式用不到），tree_content 为 None
+        self.keep_content = keep_content
+        # 可选的 StageMetrics (utils.StageMetrics): 记录渲染并写入目录树的耗时
+        self.metrics = metrics
+        self.tree_content = None
+        self._filename = None
+        self._tree = {}
+        self.file_count = 0
+        self.dir_count = 0
 
     def buildTree(self, filename, entries_generator):
         """根据条目生成器生成目录树，并返回统计信息和内容"""
-        
+        self.begin(filename)
+
         # Consume the generator to populate entries and update progress
         for entry, progress in entries_generator:
-            self.entries.append(entry)
+            self.addEntry(entry)
             yield progress
 
-        tree = self._buildTreeDict()
-        tree_content = self._formatTree(tree, os.path.basename(filename).replace('.md', ''))
+        stats = self.finish()
+        yield stats, self.tree_content
+
+    # ===== 输出端接口: 供 buildTree 以及多输出流水线 (utils.Pipeline) 调用 =====
+
+    def begin(self, filename):
+        self._filename = filename
+        self._tree = {}
+        self.tree_content = None
+        self.file_count = 0
+        self.dir_count = 0
+
+    def needsContent(self, entry):
+        """目录树只需要路径，从不读取文件内容"""
+        return False
+
+    def addEntry(self, entry, content=None):
+        parts = entry.rel_path.split(os.sep)
+        current = self._tree
+        for part in parts[:-1]:
+            current = current.setdefault(part, {})
+
+        last_part = parts[-1]
+        if entry.type == EntryType.DIRECTORY:
+            current.setdefault(last_part, {})
+            self.dir_count += 1
+        else:
+            current[last_part] = None
+            self.file_count += 1
+
+    def finish(self):
+        if self.metrics is None:
+            return self._finish()
+        return self.metrics.timed("tree", self._finish)
+
+    def _finish(self):
+        filename = self._filename
         path = Path(filename)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(tree_content, encoding='utf-8')
-        
-        file_count = sum(1 for e in self.entries if e.type != EntryType.DIRECTORY)
-        dir_count = sum(1 for e in self.entries if e.type == EntryType.DIRECTORY)
-        
-        stats = {"files": file_count, "dirs": dir_count}
-        print(f"项目树结构已生成：{path.resolve()}.")
-        
-        yield stats, tree_content
-
-    def _buildTreeDict(self):
-        tree = {}
-        for entry in self.entries:
-            parts = entry.rel_path.split(os.sep)
-            current = tree
-            for part in parts[:-1]:
-                current = current.setdefault(part, {})
-            
-            last_part = parts[-1]
-            if entry.type == EntryType.DIRECTORY:
-                current.setdefault(last_part, {})
+        lines = self._iterLines(self._tree, os.path.basename(filename).replace('.md', ''))
+        with atomic_open(path) as f:
+            if self.keep_content:
+                # 追加到 StringIO，不会反复复制已生成的部分
+                buffer = io.StringIO()
+                for line in lines:
+                    buffer.write(line)
+                    f.write(line)
+                self.tree_content = buffer.getvalue()
             else:
-                current[last_part] = None
-        return tree
-
-    def _formatTree(self, tree, root_name):
-        output = f"📁 {root_name}/\n"
-        output += self._renderSubTree(tree, "")
-        return output
-
-    def _renderSubTree(self, tree, prefix):
-        lines = ""
-        entries = sorted(tree.items(), key=lambda item: (isinstance(item[1], dict), item[0]))
-        
-        for i, (name, sub_tree) in enumerate(entries):
-            is_last = (i == len(entries) - 1)
+                f.writelines(lines)
+        self._tree = {}
+
+        stats = {"files": self.file_count, "dirs": self.dir_count}
+        print(f"项目树结构已生成：{path.resolve()}.")
+        return stats
+
+    def abort(self):
+        self._tree = {}
+
+    @staticmethod
+    def _sortedChildren(tree):
+        """文件在前、目录在后，各自按名称排序；分两组排序，省去逐项计算排序键"""
+        files = sorted(name for name, sub_tree in tree.items() if sub_tree is None)
+        dirs = sorted(name for name, sub_tree in tree.items() if sub_tree is not None)
+        return [(name, None) for name in files] + [(name, tree[name]) for name in dirs]
+
+    def _iterLines(self, tree, root_name):
+        """逐行yield目录树文本；用显式栈代替递归，目录层级再深也不会超出递归深度限制"""
+        yield f"📁 {root_name}/\n"
+        # 栈中每项: [排好序的子项, 下一个要输出的下标, 行前缀]
+        stack = [[self._sortedChildren(tree), 0, ""]]
+        while stack:
+            frame = stack[-1]
+            children, index, prefix = frame
+            if index == len(children):
+                stack.pop()
+                continue
+            frame[1] = index + 1
+
+            name, sub_tree = children[index]
+            is_last = index == len(children) - 1
             connector = "└── " if is_last else "├── "
-            
-            lines += prefix + connector
-            
-            if isinstance(sub_tree, dict):
-                lines += f"📁 {name}/\n"
-                new_prefix = prefix + ("    " if is_last else "│   ")
-                lines += self._renderSubTree(sub_tree, new_prefix)
+            if sub_tree is None:
+                yield f"{prefix}{connector}📄 {name}\n"
             else:
-                lines += f"📄 {name}\n"
-                
-        return lines
+                yield f"{prefix}{connector}📁 {name}/\n"
+                stack.append([self._sortedChildren(sub_tree), 0, prefix + ("    " if is_last else "│   ")])
@@ -0,0 +1,134 @@
+"""
+监视模式: 定时轮询项目中各文件的 (大小, 修改时间)，检测到变化并在 debounce 秒内不再变化后调用一次回调。
+
+回调通常是启用增量清单 (ScanManifest) 的重新生成: 未变化的文件直接复制上次输出中的片段，
+只有变化的文件才会重新读取和解码，因此每次更新的读取量取决于变化的文件数，而不是项目大小。
+轮询不打开文件，每个文件每次只 stat 一次（取自扫描时的 DirEntry，Windows 上无需额外的系统调用）；遍历沿用 Extractor，与导出使用相同的忽略规则和 .gitignore。
+"""
+from utils.ProjectStructureExtract import EntryType
+from utils.ScanManifest import MANIFEST_FILE
+from utils.ExportIndex import INDEX_SUFFIX
+from utils.HistoryLogger import LOG_DIR
+from utils.RunProfiler import PROFILE_DIR
+from utils.BlobCache import CACHE_DIR
+from pathlib import Path
+import os
+import re
+import threading
+import time
+
+WATCH_INTERVAL = 1.0
+WATCH_DEBOUNCE = 0.5
+# 程序自己写入的目录: 每次生成都会写历史记录、最近路径、性能分析报告和内容缓存，位于项目内时不能触发下一次生成
+APP_DIRS = (LOG_DIR, PROFILE_DIR, CACHE_DIR)
+
+def _output_pattern(output_names):
+    """
+    匹配根目录下由生成写出的文件名: 各输出文件、分片 (<stem>.partNNN<suffix>)、分片清单、索引 (.idx)、扫描清单，
+    以及写入它们时的临时文件 (.<文件名>.<随机串>.tmp) 和分片的临时目录 (.<文件名>.shards.tmp)
+    """
+    outputs = [re.escape(MANIFEST_FILE)]
+    for name in output_names:
+        path = Path(name)
+        outputs.append(rf"{re.escape(path.name)}(?:\.shards\.json)?")
+        outputs.append(rf"{re.escape(path.stem)}\.part\d+{re.escape(path.suffix)}")
+    written = rf"(?:{'|'.join(outputs)})(?:{re.escape(INDEX_SUFFIX)})?"
+    return re.compile(rf"{written}|\.{written}\.[^{re.escape(os.sep)}]*tmp")
+
+class OutputExcludes:
+    """监视时应跳过的路径: 若干目录（及其下的所有条目），以及根目录下与输出文件名完全匹配的条目"""
+    def __init__(self, dirs=(), output_names=None):
+        self.dirs = {os.path.abspath(path) for path in dirs}
+        self.prefixes = tuple(os.path.join(path, "") for path in self.dirs)
+        self.names = _output_pattern(output_names) if output_names is not None else None
+
+    def __call__(self, path, rel_path):
+        if self.prefixes and (path.startswith(self.prefixes) or path in self.dirs):
+            return True
+        if self.names is None:
+            return False
+        # 输出文件都直接位于根目录下；分片临时目录中的条目按其顶层目录名判断
+        return self.names.fullmatch(rel_path.split(os.sep, 1)[0]) is not None
+
+def output_excludes(root_dir, result_dir, output_names=(), app_dirs=APP_DIRS):
+    """
+    返回监视时应跳过的路径 (OutputExcludes)，避免生成本身写出的文件触发下一次生成。
+    总是跳过程序自己的日志、性能分析报告和缓存目录；输出目录位于项目内部时跳过整个输出目录；
+    与项目根目录相同时只跳过名称与各输出文件及其索引、分片、临时文件和扫描清单完全匹配的条目，
+    同名前缀的用户文件（如 project_content_notes.md）照常监视。
+    """
+    root = os.path.abspath(root_dir)
+    result = os.path.abspath(result_dir)
+    dirs = list(app_dirs)
+    if result == root:
+        return OutputExcludes(dirs, output_names)
+    if result.startswith(os.path.join(root, "")):
+        dirs.append(result)
+    return OutputExcludes(dirs)
+
+class ProjectWatcher:
+    """
+    make_extractor() 每次轮询返回一个新的 Extractor（需 keep_stat=True）；on_change(changed_paths) 在变化稳定后被调用，
+    changed_paths 为新增、修改或删除的相对路径（已排序）。
+    exclude(path, rel_path) 为真的条目不监视（通常为 output_excludes() 的结果）。
+    """
+    def __init__(self, make_extractor, on_change, debounce=WATCH_DEBOUNCE, exclude=None):
+        self.make_extractor = make_extractor
+        self.on_change = on_change
+        self.debounce = debounce
+        self.exclude = exclude
+        self._snapshot = None
+        self._pending = set()
+        self._last_change = 0.0
+
+    def snapshot(self):
+        """
+        扫描一次，返回 {相对路径: (大小, 修改时间) 或 None(目录)}。
+        大小和修改时间取自扫描时的 DirEntry (keep_stat)，每个文件每次轮询只 stat 一次。
+        """
+        snapshot = {}
+        for entry, _ in self.make_extractor().extract_project_structure():
+            rel_path = entry.rel_path
+            if self.exclude is not None and self.exclude(entry.path, rel_path):
+                continue
+            if entry.type == EntryType.DIRECTORY:
+                snapshot[rel_path] = None
+            elif entry.stat is not None:
+                snapshot[rel_path] = entry.stat[:2]
+        return snapshot
+
+    def start(self):
+        """记录初始状态，之后的 poll() 与之比较"""
+        self._snapshot = self.snapshot()
+        self._pending = set()
+
+    def poll(self):
+        """扫描一次（每次轮询只取一次快照），与上一次的快照比较，返回变化的相对路径集合"""
+        current = self.snapshot()
+        previous = self._snapshot if self._snapshot is not None else current
+        changed = {rel_path for rel_path, state in current.items() if previous.get(rel_path, False) != state}
+        changed.update(rel_path for rel_path in previous if rel_path not in current)
+        self._snapshot = current
+        return changed
+
+    def step(self):
+        """轮询一次；变化已稳定 debounce 秒时调用 on_change 并返回其结果，否则返回 None"""
+        changed = self.poll()
+        now = time.monotonic()
+        if changed:
+            self._pending |= changed
+            self._last_change = now
+            return None
+        if self._pending and now - self._last_change >= self.debounce:
+            changed_paths, self._pending = sorted(self._pending), set()
+            return self.on_change(changed_paths)
+        return None
+
+def watch(watchers, stop_event=None, interval=WATCH_INTERVAL):
+    """依次轮询多个监视器，直到 stop_event 被设置（或 KeyboardInterrupt）"""
+    stop_event = stop_event or threading.Event()
+    for watcher in watchers:
+        watcher.start()
+    while not stop_event.wait(interval):
+        for watcher in watchers:
+            watcher.step()
@@ -0,0 +1,183 @@
+"""
+性能分析模式: 用 cProfile 记录函数耗时、用 tracemalloc 记录内存分配，报告保存在 log/profiles/ 中
+（与 log/history.jsonl 相邻），并通过历史记录中的 stats["profile"] 链接，事后即可排查某次很慢或很占内存的运行。
+
+    <时间>_<操作>.prof  cProfile 统计，可用 `python -m pstats` 或 snakeviz 等工具查看
+    <时间>_<操作>.txt   摘要: 累计耗时最多的函数、内存峰值，以及峰值附近和结束时分配最多的代码行
+
+cProfile 只记录调用 start() 的线程（生成任务中即扫描和写入所在的线程），读取线程池中的耗时体现为等待；
+tracemalloc 记录整个进程。后台线程在已分配内存每增长 PEAK_SNAPSHOT_GROWTH 倍时拍一次快照，最后一张即峰值附近的分配情况。
+多个运行可以同时开启性能分析: tracemalloc 按引用计数启动和停止，最后一个结束的运行才会停止它；此时内存峰值包含其他运行的分配。
+开启后运行会明显变慢，只应在排查问题时使用。
+"""
+from utils.HistoryLogger import LOG_DIR
+from utils.AtomicFile import atomic_open
+from datetime import datetime
+from pathlib import Path
+import io
+import threading
+
+PROFILE_DIR = LOG_DIR / "profiles"
+PROFILE_TOP = 25
+# 只保留最近这么多次运行的报告
+PROFILE_KEEP = 20
+PEAK_POLL_INTERVAL = 0.1
+PEAK_SNAPSHOT_GROWTH = 1.2
+
+# tracemalloc 是进程级的: 由同时进行的各次运行共享，最后一个结束的运行负责停止
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+
+def _acquire_tracing():
+    global _tracing_users, _tracing_started
+    import tracemalloc
+    with _tracing_lock:
+        if _tracing_users == 0:
+            # 已由外部（如 PYTHONTRACEMALLOC）开启时不归我们停止
+            _tracing_started = not tracemalloc.is_tracing()
+            if _tracing_started:
+                tracemalloc.start()
+        _tracing_users += 1
+        # 只有一个运行时才重置峰值，以免清掉其他运行正在记录的峰值
+        if _tracing_users == 1:
+            tracemalloc.reset_peak()
+
+def _release_tracing():
+    global _tracing_users, _tracing_started
+    import tracemalloc
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+def _top_lines(snapshot, top):
+    """按代码行汇总快照中的分配，返回前 top 行的文本"""
+    import tracemalloc
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+    lines = []
+    for stat in snapshot.statistics("lineno")[:top]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:12.1f} KiB {stat.count:9d} 块  {frame.filename}:{frame.lineno}")
+    return lines
+
+def _prune(profile_dir, keep):
+    """删除较早的报告，只保留最近 keep 次运行"""
+    reports = sorted(profile_dir.glob("*.prof"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for stale in reports[keep:]:
+        for path in (stale, stale.with_suffix(".txt")):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+class RunProfiler:
+    """
+    profiler = RunProfiler("generate_json")
+    result = profiler.run(func, *args)   # 或 start() ... stop()
+    stats["profile"] = profiler.report   # {"cprofile", "report", "peak_traced_bytes"}，保存失败时为 {"error"}
+    """
+    def __init__(self, action_name, profile_dir=PROFILE_DIR, top=PROFILE_TOP, keep=PROFILE_KEEP):
+        self.action_name = action_name
+        self.profile_dir = Path(profile_dir)
+        self.top = top
+        self.keep = keep
+        self.report = None
+        self._profile = None
+        self._stop_sampling = None
+        self._sampler = None
+        self._peak_snapshot = None
+        self._peak_snapshot_size = 0
+
+    def start(self):
+        # 延迟导入: 未开启性能分析时用不到
+        import cProfile
+        _acquire_tracing()
+        self._stop_sampling = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_peak, daemon=True)
+        self._sampler.start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self):
+        """停止记录并保存报告，返回 self.report"""
+        import tracemalloc
+        self._profile.disable()
+        self._stop_sampling.set()
+        self._sampler.join()
+        try:
+            _, peak = tracemalloc.get_traced_memory()
+            final_snapshot = tracemalloc.take_snapshot()
+        except RuntimeError as e:
+            # tracemalloc 被外部停止
+            print(f"保存性能分析报告失败: {e}")
+            self.report = {"error": str(e)}
+            return self.report
+        finally:
+            _release_tracing()
+        try:
+            self.report = self._write_reports(peak, final_snapshot)
+        except (OSError, RuntimeError) as e:
+            print(f"保存性能分析报告失败: {e}")
+            self.report = {"error": str(e)}
+        return self.report
+
+    def run(self, func, *args):
+        """在性能分析下调用 func(*args)；无论成功与否都会保存报告"""
+        self.start()
+        try:
+            return func(*args)
+        finally:
+            self.stop()
+
+    def _sample_peak(self):
+        import tracemalloc
+        while not self._stop_sampling.wait(PEAK_POLL_INTERVAL):
+            current, _ = tracemalloc.get_traced_memory()
+            if current > self._peak_snapshot_size * PEAK_SNAPSHOT_GROWTH:
+                try:
+                    self._peak_snapshot = tracemalloc.take_snapshot()
+                except RuntimeError:
+                    # tracemalloc 被外部停止，不再拍快照
+                    return
+                self._peak_snapshot_size = current
+
+    def _write_reports(self, peak, final_snapshot):
+        import pstats
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{datetime.now():%Y%m%d-%H%M%S}_{self.action_name}"
+        stats_path = self.profile_dir / f"{stem}.prof"
+        number = 1
+        while stats_path.exists():
+            number += 1
+            stats_path = self.profile_dir / f"{stem}_{number}.prof"
+        report_path = stats_path.with_suffix(".txt")
+        self._profile.dump_stats(str(stats_path))
+
+        buffer = io.StringIO()
+        pstats.Stats(self._profile, stream=buffer).sort_stats("cumulative").print_stats(self.top)
+        sections = [
+            f"操作: {self.action_name}",
+            f"内存峰值 (tracemalloc): {peak / 1024 / 1024:.1f} MB",
+            "",
+            f"===== 累计耗时最多的 {self.top} 个函数 =====",
+            buffer.getvalue().strip(),
+            "",
+        ]
+        if self._peak_snapshot is not None:
+            sections.append(f"===== 峰值附近分配最多的代码行（快照时已分配 {self._peak_snapshot_size / 1024 / 1024:.1f} MB）=====")
+            sections.extend(_top_lines(self._peak_snapshot, self.top))
+            sections.append("")
+        sections.append("===== 结束时仍未释放、分配最多的代码行 =====")
+        sections.extend(_top_lines(final_snapshot, self.top))
+        with atomic_open(report_path) as f:
+            f.write("\n".join(sections) + "\n")
+
+        _prune(self.profile_dir, self.keep)
+        return {"cprofile": str(stats_path), "report": str(report_path), "peak_traced_bytes": peak}
@@ -0,0 +1,194 @@
+from utils.ProjectStructureExtract import EntryType
+from utils.AtomicFile import atomic_open, encode_text
+from collections import namedtuple
+from pathlib import Path
+import json
+import os
+import time
+
+MANIFEST_FILE = ".project_manifest.json"
+MANIFEST_VERSION = 1
+
+# 单个文件的缓存记录；二进制文件的 encoding 和 digest 为 None
+ManifestRecord = namedtuple("ManifestRecord", "size mtime_ns inode encoding is_binary digest")
+
+def stat_key(st):
+    """用于判断文件是否变化的 (size, mtime_ns, inode)"""
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+class FragmentSource:
+    """上一次生成的输出文件，按记录的字节偏移取出未变化条目的已编码片段"""
+    def __init__(self, path, fragments):
+        self.path = Path(path)
+        self.fragments = fragments
+        self._file = None
+
+    def has(self, entry):
+        if entry.record is None:
+            return False
+        fragment = self.fragments.get(entry.rel_path)
+        return fragment is not None and fragment[2] == entry.record.digest
+
+    def read(self, rel_path):
+        offset, length, _ = self.fragments[rel_path]
+        if self._file is None:
+            self._file = open(self.path, 'rb')
+        self._file.seek(offset)
+        return self._file.read(length)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class FragmentWriter:
+    """
+    在二进制输出流上写入文本并统计字节偏移。
+    上次输出中有可复用片段的条目直接从 FragmentSource 复制，并把每个条目的片段位置记录到清单中。
+    所有条目的 [rel_path, 偏移, 长度] 按写入顺序记录在 entries 中，供随机访问索引 (utils.ExportIndex) 使用。
+    """
+    def __init__(self, f, manifest=None, source=None, metrics=None):
+        self.f = f
+        self.manifest = manifest
+        self.source = source
+        # 可选的 StageMetrics: 记录编码与写入耗时、复用的片段数
+        self.metrics = metrics
+        self.offset = 0
+        self.fragments = {}
+        self.entries = []
+
+    def write(self, text):
+        data = encode_text(text)
+        self.f.write(data)
+        self.offset += len(data)
+
+    def write_entry(self, entry, content, encode, data=None):
+        """data 为调用方已编码好的片段时直接写入，不再重复编码"""
+        metrics = self.metrics
+        if data is None:
+            if self.source is not None and self.source.has(entry):
+                data = self.source.read(entry.rel_path)
+                if metrics is not None:
+                    metrics.count("fragments_reused")
+            elif metrics is None:
+                data = encode_text(encode(entry.rel_path, content))
+            else:
+                data = metrics.timed("serialize", lambda: encode_text(encode(entry.rel_path, content)))
+
+        record = self.manifest.remember(entry) if self.manifest is not None else None
+        if record is not None:
+            self.fragments[entry.rel_path] = [self.offset, len(data), record.digest]
+        self.entries.append([entry.rel_path, self.offset, len(data)])
+
+        if metrics is None:
+            self.f.write(data)
+        else:
+            metrics.timed("write", self.f.write, data)
+        self.offset += len(data)
+
+class ScanManifest:
+    """
+    保存在输出目录中的持久化扫描清单: rel_path -> (size, mtime_ns, inode, encoding, is_binary, 内容哈希)，
+    以及每个输出文件中各条目片段的字节偏移。
+    Extractor 用它跳过未变化文件的二进制嗅探，Writer 用它直接复制上次输出中的片段而不再读取文件。
+    """
+    def __init__(self, result_dir, root_dir):
+        self.path = Path(result_dir) / MANIFEST_FILE
+        self.root_dir = os.path.abspath(root_dir)
+        self.scan_started_ns = time.time_ns()
+        self.previous_scan_ns = 0
+        self.files = {}
+        self.outputs = {}
+        self.new_files = {}
+        # (size, mtime_ns, inode) -> 记录，首次按路径未命中时才建立，用于识别被移动/重命名的文件
+        self._by_stat = None
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION or data.get("root_dir") != self.root_dir:
+                return
+            self.previous_scan_ns = data.get("scan_started_ns", 0)
+            self.files = {rel_path: ManifestRecord(*record) for rel_path, record in data.get("files", {}).items()}
+            self.outputs = data.get("outputs", {})
+        except Exception as e:
+            print(f"读取扫描清单失败，将完整重新生成: {e}")
+            self.files = {}
+            self.outputs = {}
+
+    def lookup(self, rel_path, st):
+        """
+        返回与当前 stat 匹配的记录；上次扫描开始后才修改的文件视为已变化（防止同一时间戳内的修改被漏掉）。
+        按路径未命中时再按 (size, mtime_ns, inode) 查找，移动或重命名过的文件仍可沿用判定结果和内容哈希。
+        """
+        key = stat_key(st)
+        record = self.files.get(rel_path)
+        if record is None or (record.size, record.mtime_ns, record.inode) != key:
+            record = self._lookup_stat(key)
+            if record is None:
+                return None
+        if record.mtime_ns >= self.previous_scan_ns:
+            return None
+        return record
+
+    def _lookup_stat(self, key):
+        if not key[2]:
+            # 没有可靠 inode 的文件系统上不按 stat 匹配
+            return None
+        if self._by_stat is None:
+            self._by_stat = {(r.size, r.mtime_ns, r.inode): r for r in self.files.values() if r.inode}
+        return self._by_stat.get(key)
+
+    def remember(self, entry):
+        """把本次处理过的文件写入新清单，返回其记录（无法缓存时返回 None）"""
+        if entry.stat is None:
+            return None
+        record = entry.record
+        if record is None:
+            size, mtime_ns, inode = entry.stat
+            if entry.type == EntryType.BINARY_FILE:
+                record = ManifestRecord(size, mtime_ns, inode, None, True, None)
+            elif entry.type == EntryType.FILE and entry.digest is not None:
+                record = ManifestRecord(size, mtime_ns, inode, entry.encoding, False, entry.digest)
+            else:
+                return None
+        self.new_files[entry.rel_path] = record
+        return record
+
+    def fragment_source(self, output_path):
+        """上次输出文件仍与清单中记录的一致时返回 FragmentSource，否则返回 None"""
+        output = self.outputs.get(str(Path(output_path).resolve()))
+        if not output:
+            return None
+        try:
+            st = os.stat(output_path)
+        except OSError:
+            return None
+        if (st.st_size, st.st_mtime_ns) != (output["size"], output["mtime_ns"]):
+            return None
+        return FragmentSource(output_path, output["fragments"])
+
+    def record_output(self, output_path, fragments):
+        """记录刚生成的输出文件及其片段位置，并保存清单"""
+        st = os.stat(output_path)
+        self.outputs[str(Path(output_path).resolve())] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "fragments": fragments,
+        }
+        self.save()
+
+    def save(self):
+        data = {
+            "version": MANIFEST_VERSION,
+            "root_dir": self.root_dir,
+            "scan_started_ns": self.scan_started_ns,
+            "files": {rel_path: list(record) for rel_path, record in self.new_files.items()},
+            "outputs": self.outputs,
+        }
+        with atomic_open(self.path) as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
@@ -0,0 +1,217 @@
+"""
+按字节 / 近似 token 预算把 JSON 或 XML 导出拆分为多个分片，便于分批喂给上下文窗口有限的 AI。
+
+分片在同一次流式遍历中完成: 每个条目编码一次，放得下就写入当前分片，放不下就开启新分片。
+条目按目录遍历顺序到达，同一目录下的文件天然相邻；当前分片已接近装满时，
+遇到新目录会提前换片，尽量不把一个目录拆到两个分片中。
+
+    project_content.part001.json, project_content.part002.json, ...  每个分片都是完整、合法的文档
+    project_content.json.shards.json                                 分片清单
+"""
+from utils.ProjectStructureExtract import EntryType
+from utils.ContentReader import ContentReader, DEFAULT_WORKERS
+from utils.AtomicFile import atomic_open
+from utils.ExportIndex import index_path_for
+from functools import partial
+from pathlib import Path
+import json
+import os
+import shutil
+
+# 近似 token 数: 按每个 token 约 4 字节估算
+BYTES_PER_TOKEN = 4
+# 为分隔符和文档结尾预留的字节数
+SHARD_OVERHEAD = 16
+# 当前分片已用到预算的这个比例时，遇到新目录就换片
+LOCALITY_FILL = 0.8
+
+def shard_budget(max_bytes=0, max_tokens=0):
+    """把字节预算和 token 预算合并为一个字节预算，0 表示不分片"""
+    budgets = [int(max_bytes or 0), int(max_tokens or 0) * BYTES_PER_TOKEN]
+    budgets = [budget for budget in budgets if budget > 0]
+    return min(budgets) if budgets else 0
+
+def shard_path(output_path, number):
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.stem}.part{number:03d}{output_path.suffix}")
+
+def shard_manifest_path(output_path):
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.name}.shards.json")
+
+def _shard_names(output_path):
+    """上次分片导出的分片文件名；没有分片清单时返回空集合"""
+    try:
+        with open(shard_manifest_path(output_path), 'r', encoding='utf-8') as f:
+            return {shard["file"] for shard in json.load(f).get("shards", [])}
+    except (OSError, ValueError, AttributeError, TypeError, KeyError):
+        return set()
+
+def _unlink(*paths):
+    for path in paths:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+def remove_shards(output_path):
+    """改回不分片导出后，删除上次留下的分片、分片索引和分片清单，避免读取方拿到过期的分片"""
+    output_path = Path(output_path)
+    manifest_path = shard_manifest_path(output_path)
+    if not manifest_path.exists():
+        return
+    for name in _shard_names(output_path):
+        _unlink(output_path.with_name(name), index_path_for(output_path.with_name(name)))
+    _unlink(manifest_path)
+
+def make_writer(writer_class, read_workers=DEFAULT_WORKERS, budget_bytes=0, manifest=None, blob_cache=None, metrics=None):
+    """按预算返回普通的 writer_class 写入器或分片写入器，二者接口相同"""
+    if budget_bytes > 0:
+        return ShardedWriter(partial(writer_class, read_workers, metrics=metrics), budget_bytes, read_workers,
+                             manifest, blob_cache, metrics)
+    return writer_class(read_workers, manifest=manifest, blob_cache=blob_cache, metrics=metrics)
+
+def output_path_for(output_path, budget_bytes=0):
+    """分片导出时实际的结果文件是分片清单"""
+    return shard_manifest_path(output_path) if budget_bytes > 0 else Path(output_path)
+
+class ShardedWriter:
+    """
+    输出端: 接口与 Writer / XmlWriter 相同，内部为每个分片创建一个 sink_factory() 生成的写入器。
+    各分片先写到临时目录，全部完成后才移动到输出目录并写入分片清单，取消时原有输出保持不变。
+    """
+    def __init__(self, sink_factory, budget_bytes, read_workers=DEFAULT_WORKERS, manifest=None, blob_cache=None, metrics=None):
+        if budget_bytes <= 0:
+            raise ValueError("分片预算必须大于 0")
+        self.sink_factory = sink_factory
+        self.budget_bytes = budget_bytes
+        self.reader = ContentReader(read_workers, blob_cache=blob_cache, metrics=metrics)
+        # 分片边界每次都可能变化，不复用上次的片段，只把处理过的文件记入扫描清单
+        self.manifest = manifest
+        self._goal_file = None
+        self._staging = None
+        self._sink = None
+        self._encoder = None
+        self._shards = []
+        self._last_dir = None
+        self.file_count = 0
+        self.dir_count = 0
+
+    def updateFile(self, filename, entries_generator):
+        """根据条目生成器生成分片，先yield进度，最后yield统计信息"""
+        self.begin(filename)
+        try:
+            for entry, progress, content in self.reader.iter_contents(entries_generator):
+                self.addEntry(entry, content)
+                if entry.type != EntryType.DIRECTORY:
+                    yield progress
+        except BaseException:
+            self.abort()
+            raise
+
+        yield self.finish()
+
+    # ===== 输出端接口: 供 updateFile 以及多输出流水线 (utils.Pipeline) 调用 =====
+
+    def begin(self, filename):
+        self._goal_file = Path(filename)
+        self._staging = self._goal_file.with_name(f".{self._goal_file.name}.shards.tmp")
+        shutil.rmtree(self._staging, ignore_errors=True)
+        self._staging.mkdir(parents=True)
+        self._shards = []
+        self._sink = None
+        # 只用来编码条目、估算大小的写入器，不打开任何文件
+        self._encoder = self.sink_factory()
+        self._last_dir = None
+        self.file_count = 0
+        self.dir_count = 0
+
+    def needsContent(self, entry):
+        return True
+
+    def addEntry(self, entry, content):
+        if entry.type == EntryType.DIRECTORY:
+            self.dir_count += 1
+            return
+
+        data = self._encoder.encodeEntry(entry, content)
+        rel_dir = os.path.dirname(entry.rel_path)
+        if self._sink is not None:
+            used = self._sink.bytesWritten()
+            overflow = used + len(data) + SHARD_OVERHEAD > self.budget_bytes
+            new_dir = rel_dir != self._last_dir and used >= self.budget_bytes * LOCALITY_FILL
+            if overflow or new_dir:
+                self._close_shard()
+        if self._sink is None:
+            self._open_shard()
+
+        self._sink.addEntry(entry, content, data)
+        shard = self._shards[-1]
+        shard["files"] += 1
+        shard["paths"].append(entry.rel_path)
+        self._last_dir = rel_dir
+        self.file_count += 1
+        if self.manifest is not None:
+            self.manifest.remember(entry)
+
+    def finish(self):
+        goal_file = self._goal_file
+        if self._sink is not None:
+            self._close_shard()
+
+        # 全部分片完成后再移动到输出目录，并删除上次多出来的旧分片
+        previous = _shard_names(goal_file)
+        current = set()
+        for shard in self._shards:
+            staged = self._staging / shard["file"]
+            target = goal_file.with_name(shard["file"])
+            os.replace(staged, target)
+            staged_index = index_path_for(staged)
+            if staged_index.exists():
+                os.replace(staged_index, index_path_for(target))
+            current.add(shard["file"])
+        for name in previous - current:
+            _unlink(goal_file.with_name(name), index_path_for(goal_file.with_name(name)))
+        # 之前不分片导出的单个文件及其索引已经过期
+        _unlink(goal_file, index_path_for(goal_file))
+        shutil.rmtree(self._staging, ignore_errors=True)
+
+        manifest_path = shard_manifest_path(goal_file)
+        with atomic_open(manifest_path) as f:
+            json.dump({
+                "format": goal_file.suffix.lower().lstrip('.'),
+                "budget_bytes": self.budget_bytes,
+                "approx_budget_tokens": self.budget_bytes // BYTES_PER_TOKEN,
+                "shards": self._shards,
+            }, f, ensure_ascii=False, indent=2)
+        if self.manifest is not None:
+            self.manifest.save()
+
+        stats = {"files": self.file_count, "dirs": self.dir_count, "shards": len(self._shards)}
+        print(f"分片导出已生成：{manifest_path.resolve()}，共 {len(self._shards)} 个分片、{self.file_count} 个文件。")
+        return stats
+
+    def abort(self):
+        """丢弃本次写入的所有分片，保留原有输出"""
+        if self._sink is not None:
+            self._sink.abort()
+            self._sink = None
+        if self._staging is not None:
+            shutil.rmtree(self._staging, ignore_errors=True)
+
+    def _open_shard(self):
+        name = shard_path(self._goal_file, len(self._shards) + 1).name
+        self._sink = self.sink_factory()
+        # 分片写在临时目录中，由本类统一输出结果信息
+        self._sink.verbose = False
+        self._sink.begin(self._staging / name)
+        self._shards.append({"file": name, "bytes": 0, "approx_tokens": 0, "files": 0, "paths": []})
+
+    def _close_shard(self):
+        sink, self._sink = self._sink, None
+        sink.finish()
+        shard = self._shards[-1]
+        shard["bytes"] = os.path.getsize(self._staging / shard["file"])
+        shard["approx_tokens"] = shard["bytes"] // BYTES_PER_TOKEN
+        # 单个文件本身就超出预算时只能独占一个分片
+        shard["oversized"] = shard["bytes"] > self.budget_bytes
@@ -0,0 +1,63 @@
+"""
+分阶段计时与计数: 遍历、嗅探、读取、解码、XML 清理、编码、写入等各阶段的耗时，
+读写字节数、各解码方式 (utf-8 -> gbk -> utf-8-ignore) 的次数以及最慢的文件，最终写入 log_action 记录的 stats["metrics"]。
+
+未启用时各处持有的是 None，每个条目只多几次 `is not None` 判断。
+读取阶段由多个线程同时记录，所有更新都在锁内完成；各阶段耗时是所有线程的累计时间，可能超过总耗时。
+"""
+from time import perf_counter
+import heapq
+import threading
+
+SLOWEST_FILES = 10
+
+class StageMetrics:
+    def __init__(self, slowest_files=SLOWEST_FILES):
+        self._lock = threading.Lock()
+        self.slowest_files = slowest_files
+        self.stages = {}     # 阶段名 -> [累计秒数, 次数]
+        self.counters = {}   # 计数器名 -> 数值
+        self._slowest = []   # (秒数, 相对路径) 的最小堆，只保留最慢的 slowest_files 个
+
+    def add(self, stage, seconds, **counters):
+        """累计一次 stage 阶段的耗时，并顺带累加计数器"""
+        with self._lock:
+            total = self.stages.get(stage)
+            if total is None:
+                self.stages[stage] = [seconds, 1]
+            else:
+                total[0] += seconds
+                total[1] += 1
+            for name, amount in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def file_time(self, rel_path, seconds):
+        """记录单个文件的处理耗时（读取 + 解码）"""
+        item = (seconds, rel_path)
+        with self._lock:
+            if len(self._slowest) < self.slowest_files:
+                heapq.heappush(self._slowest, item)
+            elif item > self._slowest[0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def timed(self, stage, func, *args):
+        """调用 func(*args) 并把耗时计入 stage 阶段"""
+        start = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.add(stage, perf_counter() - start)
+
+    def report(self):
+        with self._lock:
+            return {
+                "stages": {name: {"seconds": round(seconds, 4), "calls": calls}
+                           for name, (seconds, calls) in self.stages.items()},
+                "counters": dict(sorted(self.counters.items())),
+                "slowest_files": [{"path": rel_path, "seconds": round(seconds, 4)}
+                                  for seconds, rel_path in sorted(self._slowest, reverse=True)],
+            }
@@ -1,70 +1,168 @@
 from utils.ProjectStructureExtract import EntryType
+from utils.ContentReader import ContentReader, DEFAULT_WORKERS
+from utils.AtomicFile import AtomicFile, atomic_open, encode_text
+from utils.ScanManifest import FragmentWriter
+from utils.ExportIndex import write_index
+from utils.ShardedExport import remove_shards
 from pathlib import Path
 import os
 import re
-from xml.sax.saxutils import escape
 
 _illegal_xml_chars_re = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x84\x86-\x9f]')
 
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<project>\n'
+XML_FOOTER = '</project>\n'
+
 def _strip_illegal_xml_chars(s):
     return _illegal_xml_chars_re.sub('', s)
 
+def escape(data):
+    """与 xml.sax.saxutils.escape 相同；不导入 saxutils 以免连带加载 urllib/http，拖慢命令行冷启动"""
+    return data.replace("&", "&amp;").replace(">", "&gt;").replace("<", "&lt;")
+
+def xml_path(rel_path):
+    """XML 中 path 属性使用的路径写法"""
+    return rel_path.replace(os.sep, '/').replace('\u00A0', ' ')
+
+def encode_file_element(rel_path, content):
+    """把一个文件条目编码为完整的 <file> 元素文本"""
+    escaped_path = escape(xml_path(rel_path))
+
+    if ']]>' in content:
+        content_xml = f'    <content>{escape(content)}</content>\n'
+    else:
+        content_xml = f'    <content><![CDATA[{content}]]></content>\n'
+
+    return f'  <file path="{escaped_path}">\n{content_xml}  </file>\n'
+
 class XmlWriter:
-    def __init__(self):
-        pass
+    # 为 False 时 finish() 不打印结果信息（例如作为分片写入器使用时）
+    verbose = True
+
+    def __init__(self, read_workers=DEFAULT_WORKERS, stream=True, manifest=None, blob_cache=None, index=True, metrics=None):
+        self.reader = ContentReader(read_workers, blob_cache=blob_cache, metrics=metrics)
+        # 可选的 StageMetrics (utils.StageMetrics)
+        self.metrics = metrics
+        # 流式模式下每个 <file> 元素直接写入缓冲文件，内存占用与项目大小无关
+        self.stream = stream
+        # 流式模式下在输出旁写入随机访问索引 (<输出文件>.idx)
+        self.index = index
+        # 可选的 ScanManifest (仅流式模式): 未变化的文件直接复制上次输出中的片段
+        self.manifest = manifest
+        self._goal_file = None
+        self._atomic = None
+        self._out = None
+        self._source = None
+        self._xml_parts = None
+        self.file_count = 0
+        self.dir_count = 0
 
     def updateFile(self, filename, entries_generator):
-        xml_parts = ['<?xml version="1.0" encoding="UTF-8"?>\n', '<project>\n']
-
-        file_count = 0
-        dir_count = 0
-        
-        for entry, progress in entries_generator:
-            if entry.type == EntryType.DIRECTORY:
-                dir_count += 1
-                continue
-            
-            file_count += 1
-            
-            rel_path_posix = entry.rel_path.replace(os.sep, '/').replace('\u00A0', ' ')
-            escaped_path = escape(rel_path_posix)
-
-            content = ""
-            if entry.type == EntryType.BINARY_FILE:
-                content = "Binary File CANNOT Be Read"
-            elif entry.type == EntryType.FILE:
-                path = Path(entry.path)
-                try:
-                    raw_content = path.read_text(encoding='utf-8')
-                except UnicodeDecodeError:
-                    try:
-                        raw_content = path.read_text(encoding='gbk')
-                    except UnicodeDecodeError:
-                        raw_content = path.read_text(encoding='utf-8', errors='ignore')
-                except Exception as e:
-                    raw_content = f"Error reading file: {e}"
-                
-                content = _strip_illegal_xml_chars(raw_content)
-            
-            xml_parts.append(f'  <file path="{escaped_path}">\n')
-            
-            if ']]>' in content:
-                xml_parts.append(f'    <content>{escape(content)}</content>\n')
+        self.begin(filename)
+        try:
+            for entry, progress, content in self.reader.iter_contents(entries_generator, self._reusable):
+                self.addEntry(entry, content)
+                if entry.type != EntryType.DIRECTORY:
+                    yield progress
+        except BaseException:
+            self.abort()
+            raise
+
+        yield self.finish()
+
+    # ===== 输出端接口: 供 updateFile 以及多输出流水线 (utils.Pipeline) 调用 =====
+
+    def begin(self, filename):
+        self._goal_file = Path(filename)
+        self.file_count = 0
+        self.dir_count = 0
+        if self.stream:
+            if self.manifest is not None:
+                self._source = self.manifest.fragment_source(self._goal_file)
+            # 先写临时文件，完成后原子重命名，崩溃时不会留下写了一半的 XML
+            self._atomic = AtomicFile(self._goal_file, 'wb')
+            self._out = FragmentWriter(self._atomic.file, self.manifest, self._source, self.metrics)
+            self._out.write(XML_HEADER)
+        else:
+            self._xml_parts = [XML_HEADER]
+
+    def needsContent(self, entry):
+        """该条目是否需要读取文件内容（能直接复用上次输出片段时不需要）"""
+        return not (self._source is not None and self._source.has(entry))
+
+    def encodeEntry(self, entry, content):
+        """返回该文件条目在输出中的完整字节片段（分片导出据此估算大小）"""
+        if entry.type == EntryType.FILE:
+            content = self._sanitize(content)
+        if self.metrics is not None:
+            return self.metrics.timed("serialize", lambda: encode_text(encode_file_element(entry.rel_path, content)))
+        return encode_text(encode_file_element(entry.rel_path, content))
+
+    def bytesWritten(self):
+        return self._out.offset
+
+    def addEntry(self, entry, content, data=None):
+        if entry.type == EntryType.DIRECTORY:
+            self.dir_count += 1
+            return
+
+        self.file_count += 1
+        if data is None and entry.type == EntryType.FILE and content is not None:
+            content = self._sanitize(content)
+
+        if self.stream:
+            self._out.write_entry(entry, content, encode_file_element, data)
+        else:
+            self._xml_parts.append(encode_file_element(entry.rel_path, content))
+
+    def finish(self):
+        goal_file = self._goal_file
+        if self.stream:
+            self._out.write(XML_FOOTER)
+            if self.metrics is None:
+                self._atomic.commit()
             else:
-                xml_parts.append(f'    <content><![CDATA[{content}]]></content>\n')
-            
-            xml_parts.append(f'  </file>\n')
-            
-            yield progress
-
-        xml_parts.append('</project>\n')
-        
-        final_xml = "".join(xml_parts)
-
-        goal_file = Path(filename)
-        goal_file.parent.mkdir(parents=True, exist_ok=True)
-        goal_file.write_text(final_xml, encoding='utf-8')
-
-        stats = {"files": file_count, "dirs": dir_count}
-        print(f"XML 文件已生成：{goal_file.resolve()}，共 {file_count} 个文件。")
-        yield stats
+                self.metrics.timed("write", self._atomic.commit)
+                self.metrics.count("bytes_written", self._out.offset)
+            self._close_source()
+            if self.index:
+                entries = [[xml_path(rel_path), offset, length] for rel_path, offset, length in self._out.entries]
+                if self.metrics is None:
+                    write_index(goal_file, "xml", entries)
+                else:
+                    self.metrics.timed("index", write_index, goal_file, "xml", entries)
+            if self.manifest is not None:
+                self.manifest.record_output(goal_file, self._out.fragments)
+        else:
+            self._xml_parts.append(XML_FOOTER)
+            final_xml = "".join(self._xml_parts)
+            self._xml_parts = None
+            with atomic_open(goal_file) as f:
+                f.write(final_xml)
+
+        # 之前分片导出留下的分片已经过期
+        remove_shards(goal_file)
+
+        stats = {"files": self.file_count, "dirs": self.dir_count}
+        if self.verbose:
+            print(f"XML 文件已生成：{goal_file.resolve()}，共 {self.file_count} 个文件。")
+        return stats
+
+    def _sanitize(self, content):
+        if self.metrics is None:
+            return _strip_illegal_xml_chars(content)
+        return self.metrics.timed("sanitize", _strip_illegal_xml_chars, content)
+
+    def abort(self):
+        """丢弃写了一半的临时文件，保留原有输出"""
+        if self._atomic is not None:
+            self._atomic.discard()
+        self._close_source()
+
+    def _reusable(self, entry):
+        return not self.needsContent(entry)
+
+    def _close_source(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None